@@ -1,31 +1,35 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Request
+from typing import Dict, List, Optional
+import asyncio
 import uuid
 import zipfile
 import shutil
 from pathlib import Path
 from src.utils.job_status import read_status
-from src.utils.versioning import get_latest_version
+from src.utils.versioning import get_latest_version, list_model_versions, best_model_version
 from src.constants import RUNS_DIR
 from src.constants import DATASET_METADATA_FILE
-from src.utils.s3_utils import download_file_from_s3
-from tempfile import TemporaryDirectory
-from src.utils.s3_utils import download_file_from_s3
-from tempfile import TemporaryDirectory
-
-
-from tempfile import TemporaryDirectory
-from src.utils.s3_utils import download_file_from_s3
+from src.utils.s3_streaming import stream_s3_object
 from src.constants import DATASET_METADATA_FILE, S3_DATASET_PREFIX
 
 from src.constants import (
     BASE_UPLOAD_DIR,
     RAW_ZIP_DIR,
-    EXTRACTED_DIR
+    EXTRACTED_DIR,
+    EXTRACT_ON_UPLOAD,
+    PROCESSED_DIR
 )
+from src.components.data_ingestion import save_upload_stream, record_upload
+from src.components.data_ingestion import UploadTooLargeError
 from src.components.data_validation import validate_extracted_dataset
+from src.utils.zip_extractor import extract_zip_parallel, verify_zip_parallel
+from src.utils.dataset_source import open_dataset_source
+from src.utils.dataset_manifest import build_dataset_manifest, class_map_from_manifest
 from src.components.data_transformation import transform_dataset
+from src.components.data_append import append_dataset
+from src.utils.processed_cache import processed_cache_stats
+from src.utils.artifact_cache import artifact_cache_stats
 
-from src.components.model_trainer import train_yolo_model
 from src.constants import (
     DEFAULT_EPOCHS,
     DEFAULT_IMGSZ,
@@ -33,20 +37,40 @@ from src.constants import (
     DEFAULT_MODEL
 )
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from src.constants import ARTIFACTS_DIR
 
 
-from fastapi import BackgroundTasks
-from src.pipelines.train_pipeline import run_training_job
-from src.utils.job_status import write_status
+from src.utils.job_queue import (
+    enqueue_training,
+    cancel_training,
+    list_queue,
+    get_active_entry,
+    JobAlreadyQueuedError
+)
+from src.utils.job_status import write_status, write_progress
+from src.utils.job_registry import list_jobs, get_job_events, import_status_files
+from src.utils.artifact_uploads import get_artifact_uploads
+from src.utils.event_broker import JobEventBroker, FINAL_STATES, format_sse
+from src.pipelines.predict_pipeline import Predictor
+from src.constants import PREDICT_DEFAULT_CONF, PREDICT_MAX_IMAGES
 from src.constants import (
     BASE_UPLOAD_DIR,
+    STATUS_UPLOADED,
+    STATUS_PREPROCESSING,
+    STATUS_PREPROCESSED,
     STATUS_PENDING,
+    STATUS_FAILED,
+    JOBS_PAGE_SIZE,
+    JOBS_MAX_PAGE_SIZE,
+    SSE_HEARTBEAT_SECONDS,
+    STATUS_CANCELLED,
+    TRAIN_DEFAULT_PRIORITY,
     DEFAULT_EPOCHS,
     DEFAULT_IMGSZ,
     DEFAULT_BATCH,
-    DEFAULT_MODEL
+    DEFAULT_MODEL,
+    PRE_RESIZE_IMAGES
 )
 
 
@@ -54,13 +78,31 @@ from src.constants import (
 # Ensure base directory exists
 BASE_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# One registry tail per API process for all progress streams
+event_broker = JobEventBroker()
+
+# Loaded models and inference pool, per API process
+predictor = Predictor()
+
 
 # -------------------------------
 # Upload Dataset API
 # -------------------------------
 app = FastAPI(title="VIS_APP – Vision Training Platform")
+
+
+@app.on_event("startup")
+def backfill_job_registry():
+    # Jobs created before the registry only have a status.json
+    if list_jobs(limit=1)["total"] == 0:
+        import_status_files(BASE_UPLOAD_DIR)
+
+
 @app.post("/upload-dataset")
-async def upload_dataset(file: UploadFile = File(...)):
+async def upload_dataset(
+    file: UploadFile = File(...),
+    extract: bool = EXTRACT_ON_UPLOAD
+):
 
     if not file.filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="Only ZIP files are allowed")
@@ -72,26 +114,48 @@ async def upload_dataset(file: UploadFile = File(...)):
     extracted_dir = job_dir / EXTRACTED_DIR
 
     raw_zip_dir.mkdir(parents=True, exist_ok=True)
-    extracted_dir.mkdir(parents=True, exist_ok=True)
 
     zip_path = raw_zip_dir / file.filename
 
-    # Save ZIP
-    with open(zip_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    # Save ZIP (chunked, off the event loop, hashed while streaming)
+    try:
+        size_bytes, sha256 = await save_upload_stream(file, zip_path)
+    except UploadTooLargeError as e:
+        await asyncio.to_thread(shutil.rmtree, job_dir)
+        raise HTTPException(status_code=413, detail=str(e))
 
     # Validate ZIP
-    if not zipfile.is_zipfile(zip_path):
-        shutil.rmtree(job_dir)
+    if not await asyncio.to_thread(zipfile.is_zipfile, zip_path):
+        await asyncio.to_thread(shutil.rmtree, job_dir)
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
 
-    # Extract ZIP
-    with zipfile.ZipFile(zip_path, "r") as zip_ref:
-        zip_ref.extractall(extracted_dir)
+    # Extract ZIP (bounded, parallel, CRC-checked).
+    # Without extraction later stages read members straight from the ZIP.
+    try:
+        if extract:
+            extracted_dir.mkdir(parents=True, exist_ok=True)
+            extraction = await asyncio.to_thread(
+                extract_zip_parallel, zip_path, extracted_dir
+            )
+        else:
+            extraction = await asyncio.to_thread(verify_zip_parallel, zip_path)
+    except (ValueError, zipfile.BadZipFile) as e:
+        await asyncio.to_thread(shutil.rmtree, job_dir)
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {e}")
+
+    # Both can block on locks (registry shared with the training worker)
+    await asyncio.to_thread(record_upload, job_dir, file.filename, size_bytes, sha256)
+    await asyncio.to_thread(write_status, job_dir, STATUS_UPLOADED, "Dataset uploaded")
 
     return {
         "job_id": job_id,
-        "message": "Dataset uploaded and extracted successfully"
+        "size_bytes": size_bytes,
+        "sha256": sha256,
+        "extraction": extraction,
+        "message": (
+            "Dataset uploaded and extracted successfully" if extract
+            else "Dataset uploaded and verified successfully"
+        )
     }
 
 
@@ -99,27 +163,127 @@ async def upload_dataset(file: UploadFile = File(...)):
 # Preprocess Dataset API
 # -------------------------------
 @app.post("/preprocess/{job_id}")
-def preprocess_dataset(job_id: str):
+def preprocess_dataset(job_id: str, class_map: Optional[Dict[str, int]] = Body(None)):
 
     job_dir = BASE_UPLOAD_DIR / job_id
-    extracted_dir = job_dir / EXTRACTED_DIR
 
-    if not extracted_dir.exists():
+    if not job_dir.exists():
         raise HTTPException(status_code=404, detail="Job not found")
 
-    validate_extracted_dataset(extracted_dir)
+    # processed/ is rebuilt from scratch; a queued or running training
+    # reads it
+    if get_active_entry(job_id) is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Training is queued or running for this job; cancel it before preprocessing"
+        )
 
-    # TODO: Make dynamic later
-    class_map = {
-        "teeth_good": 0,
-        "1D": 1,
-        "1G":2,
-        "1J":3
+    write_status(job_dir, STATUS_PREPROCESSING, "Preprocessing started", stage="manifest")
+
+    # Any failure is recorded with the stage it happened in, so the job
+    # does not stay in preprocessing
+    stage = "manifest"
+    try:
+        source = open_dataset_source(job_dir)
+
+        # One walk + one XML parse, persisted for every later stage
+        manifest = build_dataset_manifest(source, job_dir)
+
+        # Header-only image checks: reject broken data before training
+        stage = "validation"
+        write_progress(job_dir, stage=stage)
+        try:
+            validate_extracted_dataset(source, manifest=manifest, job_dir=job_dir)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Class map comes from the labels found in the data unless given
+        if not class_map:
+            class_map = class_map_from_manifest(manifest)
+
+        stage = "transformation"
+        write_progress(job_dir, stage=stage)
+        stats = transform_dataset(job_id, class_map, source=source, manifest=manifest)
+    except Exception as e:
+        message = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}"
+        write_status(job_dir, STATUS_FAILED, message, stage=stage)
+        raise
+
+    write_status(job_dir, STATUS_PREPROCESSED, "Dataset processed", stage="done", progress=1.0)
+
+    return {
+        "status": "dataset processed successfully",
+        "class_map": class_map,
+        "stats": stats
     }
 
-    transform_dataset(job_id, class_map)
 
-    return {"status": "dataset processed successfully"}
+# -------------------------------
+# Append Dataset API
+# -------------------------------
+@app.post("/append-dataset/{job_id}")
+async def append_dataset_delta(job_id: str, file: UploadFile = File(...)):
+
+    if not file.filename.endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Only ZIP files are allowed")
+
+    job_dir = BASE_UPLOAD_DIR / job_id
+
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Checked before anything is saved; append_dataset checks again under its lock
+    if not (job_dir / PROCESSED_DIR / "data.yaml").exists():
+        raise HTTPException(status_code=409, detail="Dataset not processed yet. Run /preprocess first.")
+
+    # The delta is written into processed/, which a training may be reading
+    if await asyncio.to_thread(get_active_entry, job_id) is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Training is queued or running for this job; cancel it before appending"
+        )
+
+    # Staged under a name find_raw_zips ignores; append_dataset moves it
+    # into place as the next delta under the job's append lock
+    staged_path = job_dir / RAW_ZIP_DIR / f".incoming-{uuid.uuid4().hex}.part"
+
+    try:
+        try:
+            size_bytes, sha256 = await save_upload_stream(file, staged_path)
+            await asyncio.to_thread(verify_zip_parallel, staged_path)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except (ValueError, zipfile.BadZipFile) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {e}")
+
+        try:
+            stats = await asyncio.to_thread(
+                append_dataset, job_id, staged_path, Path(file.filename).name
+            )
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        staged_path.unlink(missing_ok=True)
+
+    # Recorded only once the delta is part of the dataset
+    await asyncio.to_thread(record_upload, job_dir, stats["archive"], size_bytes, sha256)
+
+    return {"status": "dataset appended successfully", "stats": stats}
+
+
+# -------------------------------
+# Processed Dataset Cache API
+# -------------------------------
+@app.get("/cache/processed/stats")
+def get_processed_cache_stats():
+    return processed_cache_stats()
+
+
+@app.get("/cache/artifacts/stats")
+def get_artifact_cache_stats():
+    return artifact_cache_stats()
 
 
 # # training API
@@ -170,27 +334,6 @@ def preprocess_dataset(job_id: str):
 
 
 
-@app.get("/download/model/{job_id}")
-def download_latest_model(job_id: str):
-    artifacts_dir = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR
-    version = get_latest_version(artifacts_dir)
-
-    model_path = (
-        artifacts_dir
-        / RUNS_DIR
-        / version
-        / "model"
-        / "best.pt"
-    )
-
-    if not model_path.exists():
-        raise HTTPException(status_code=404, detail="Model not found")
-
-    return FileResponse(model_path, filename="best.pt")
-
-
-
-
 # download metrices API
 @app.get("/download/metrics/{job_id}")
 def download_metrics(job_id: str):
@@ -212,39 +355,73 @@ def download_metrics(job_id: str):
 
 
 
-# async training
+# async training (queued; run by src.pipelines.train_worker)
 
 @app.post("/train-async/{job_id}")
 def start_training_async(
     job_id: str,
-    background_tasks: BackgroundTasks,
     epochs: int = DEFAULT_EPOCHS,
     imgsz: int = DEFAULT_IMGSZ,
     batch: int = DEFAULT_BATCH,
-    model: str = DEFAULT_MODEL
+    model: str = DEFAULT_MODEL,
+    pre_resize: bool = PRE_RESIZE_IMAGES,
+    priority: int = TRAIN_DEFAULT_PRIORITY
 ):
     job_dir = BASE_UPLOAD_DIR / job_id
 
     if not job_dir.exists():
         raise HTTPException(status_code=404, detail="Job not found")
 
+    params = {
+        "epochs": epochs,
+        "imgsz": imgsz,
+        "batch": batch,
+        "model": model,
+        "pre_resize": pre_resize
+    }
+
+    if get_active_entry(job_id) is not None:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already queued or running")
+
+    if read_status(job_dir).get("status") == STATUS_PREPROCESSING:
+        raise HTTPException(status_code=409, detail="Dataset is being preprocessed")
+
+    # Written before enqueuing: once queued the worker may claim the job
+    # and record it as running at any moment
     write_status(job_dir, STATUS_PENDING, "Queued for training")
 
-    background_tasks.add_task(
-        run_training_job,
-        job_id,
-        epochs,
-        imgsz,
-        batch,
-        model
-    )
+    try:
+        entry = enqueue_training(job_id, params, priority=priority)
+    except JobAlreadyQueuedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     return {
         "status": "accepted",
-        "message": "Training started in background"
+        "message": "Training queued",
+        "queue_id": entry["id"],
+        "priority": priority
     }
 
 
+@app.post("/train-async/{job_id}/cancel")
+def cancel_training_job(job_id: str):
+    entry = cancel_training(job_id)
+
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No queued or running training for job")
+
+    if entry["state"] == STATUS_CANCELLED:
+        write_status(BASE_UPLOAD_DIR / job_id, STATUS_CANCELLED, "Training cancelled")
+        return {"status": "cancelled", "queue_id": entry["id"]}
+
+    return {"status": "cancelling", "queue_id": entry["id"]}
+
+
+@app.get("/train-queue")
+def get_train_queue(state: Optional[str] = None):
+    return list_queue(state)
+
+
 # status of training
 @app.get("/status/{job_id}")
 def get_job_status(job_id: str):
@@ -256,6 +433,80 @@ def get_job_status(job_id: str):
     return read_status(job_dir)
 
 
+# job registry
+@app.get("/jobs")
+def get_jobs(
+    state: Optional[str] = None,
+    limit: int = Query(JOBS_PAGE_SIZE, ge=1, le=JOBS_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    return list_jobs(state=state, limit=limit, offset=offset)
+
+
+@app.get("/jobs/{job_id}/events")
+def get_events(job_id: str, after_id: int = 0, limit: int = Query(1000, ge=1, le=10000)):
+    return get_job_events(job_id, after_id=after_id, limit=limit)
+
+
+@app.get("/jobs/{job_id}/uploads")
+def get_uploads(job_id: str):
+    return get_artifact_uploads(job_id)
+
+
+# live progress (server-sent events)
+@app.get("/jobs/{job_id}/stream")
+async def stream_job_events(job_id: str, request: Request, after_id: int = 0):
+
+    if not (BASE_UPLOAD_DIR / job_id).exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Reconnecting EventSource clients resume where they left off
+    last_seen = request.headers.get("last-event-id")
+    if last_seen and last_seen.isdigit():
+        after_id = int(last_seen)
+
+    async def events():
+        # Subscribe before reading the backlog so nothing falls in between
+        queue = await event_broker.subscribe(job_id)
+        try:
+            # The backlog is read in pages until exhausted: the broker only
+            # delivers events newer than its own position
+            sent = after_id
+            last = None
+            while True:
+                backlog = await asyncio.to_thread(get_job_events, job_id, sent)
+                if not backlog:
+                    break
+                for event in backlog:
+                    yield format_sse(event)
+                    sent = event["id"]
+                last = backlog[-1]
+            if last is not None and last["status"] in FINAL_STATES:
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event["id"] <= sent:
+                    continue
+                yield format_sse(event)
+                sent = event["id"]
+                if event["status"] in FINAL_STATES:
+                    return
+        finally:
+            event_broker.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
 @app.get("/download/model/{job_id}/{version}")
 def download_versioned_model(job_id: str, version: str):
@@ -310,32 +561,90 @@ def download_versioned_model(job_id: str, version: str):
 
 
 
-# s3 metadata fetch
+# inference
+async def _predict(job_id: str, version: Optional[str], files: List[UploadFile], conf: float):
+    if len(files) > PREDICT_MAX_IMAGES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {PREDICT_MAX_IMAGES} images per request"
+        )
+    images = [await file.read() for file in files]
+
+    try:
+        return await predictor.predict(job_id, version, images, conf)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Model not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/predict/stats")
+def get_predict_stats():
+    return predictor.stats()
+
+
+@app.post("/predict/{job_id}")
+async def predict_latest(
+    job_id: str,
+    files: List[UploadFile] = File(...),
+    conf: float = Query(PREDICT_DEFAULT_CONF, ge=0, le=1)
+):
+    return await _predict(job_id, None, files, conf)
+
+
+@app.post("/predict/{job_id}/{version}")
+async def predict_version(
+    job_id: str,
+    version: str,
+    files: List[UploadFile] = File(...),
+    conf: float = Query(PREDICT_DEFAULT_CONF, ge=0, le=1)
+):
+    return await _predict(job_id, version, files, conf)
+
+
+
+# model version registry
+@app.get("/models/best")
+def get_best_model(fingerprint: Optional[str] = None, job_id: Optional[str] = None):
+    if (fingerprint is None) == (job_id is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of fingerprint or job_id")
+
+    best = best_model_version(fingerprint=fingerprint, job_id=job_id)
+    if best is None:
+        raise HTTPException(status_code=404, detail="No completed model with mAP found")
+    return best
+
+
+@app.get("/models/{job_id}/versions")
+def get_model_versions(job_id: str):
+    return list_model_versions(job_id)
+
+
+
+# s3 downloads (streamed, resumable)
 @app.get("/download/model/{job_id}")
-def download_latest_model(job_id: str):
+def download_latest_model(job_id: str, request: Request):
     artifacts_dir = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR
-    version = get_latest_version(artifacts_dir)
+    try:
+        version = get_latest_version(job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Model not found")
 
     s3_key = f"{job_id}/runs/{version}/model/best.pt"
+    # the versioned copy this host trained can fill the download cache
+    local_copy = artifacts_dir / RUNS_DIR / version / "model" / "best.pt"
 
-    with TemporaryDirectory() as tmp:
-        local_path = Path(tmp) / "best.pt"
-        download_file_from_s3(local_path, s3_key)
-        return FileResponse(local_path, filename="best.pt")
+    return stream_s3_object(request, s3_key, filename="best.pt", local_copy=local_copy)
 
 
 
 @app.get("/dataset/metadata/{job_id}")
-def get_dataset_metadata(job_id: str):
+def get_dataset_metadata(job_id: str, request: Request):
 
     s3_key = f"{job_id}/{S3_DATASET_PREFIX}/{DATASET_METADATA_FILE}"
 
-    with TemporaryDirectory() as tmp:
-        local_path = Path(tmp) / DATASET_METADATA_FILE
-        download_file_from_s3(local_path, s3_key)
-        return FileResponse(
-            local_path,
-            filename=DATASET_METADATA_FILE,
-            media_type="application/json"
-        )
-
+    return stream_s3_object(
+        request,
+        s3_key,
+        filename=DATASET_METADATA_FILE,
+        media_type="application/json"
+    )
@@ -0,0 +1,22 @@
+#!/bin/bash
+# API and training worker in one container: /train-async only queues,
+# src.pipelines.train_worker runs the queue.
+#
+# SIGTERM goes to both; the worker stops its trainings and re-queues them,
+# which can take up to TRAIN_CANCEL_GRACE_SECONDS (use docker stop -t 40).
+# If either process exits, the other is stopped and the container exits.
+
+python -m src.pipelines.train_worker &
+worker=$!
+
+uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+api=$!
+
+trap 'kill -TERM "$api" "$worker" 2>/dev/null' TERM INT
+
+wait -n
+status=$?
+
+kill -TERM "$api" "$worker" 2>/dev/null
+wait
+exit $status
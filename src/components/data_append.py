@@ -0,0 +1,357 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import hashlib
+import shutil
+from pathlib import Path, PurePosixPath
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from src.constants import (
+    BASE_UPLOAD_DIR,
+    RAW_ZIP_DIR,
+    DELTA_ZIP_PREFIX,
+    EXTRACTED_DIR,
+    PROCESSED_DIR,
+    IMAGES_DIR,
+    LABELS_DIR,
+    TRAIN_DIR,
+    VAL_DIR,
+    IMAGE_EXTENSIONS,
+    ANNOTATION_EXTENSION,
+    TRAIN_SPLIT_RATIO,
+    RANDOM_SEED,
+    DATASET_METADATA_FILE,
+    ANNOTATION_STORE_FILE,
+    FINGERPRINT_MANIFEST_FILE,
+    DATASET_MANIFEST_FILE,
+    DATASET_VERSIONS_DIR,
+    DATASET_VERSIONS_INDEX,
+    TRANSFORM_WORKERS,
+    TRANSFORM_IO_WORKERS
+)
+from src.utils.annotation_scan import scan_annotations
+from src.utils.annotation_store import AnnotationStore
+from src.utils.dataset_metadata import generate_dataset_metadata
+from src.utils.dataset_source import (
+    DirectorySource,
+    ZipSource,
+    OverlaySource,
+    open_dataset_source,
+    find_raw_zips
+)
+from src.utils.file_materializer import materialize, materialize_tree
+from src.utils.fingerprint import compute_data_fingerprint, load_manifest
+from src.utils.dataset_manifest import build_dataset_manifest, processed_name, find_name_collisions
+from src.utils.zip_extractor import extract_zip_parallel
+from src.components.data_transformation import write_processed_item, upload_dataset_metadata
+from src.components.data_validation import validate_image_files, summarize_invalid_images
+
+
+def assign_split(image_name: str) -> str:
+    """
+    Deterministic split for appended images: depends only on the name and
+    RANDOM_SEED, never on what else is in the dataset, so existing items
+    are not reshuffled.
+    """
+    digest = hashlib.sha256(f"{RANDOM_SEED}:{image_name}".encode()).digest()
+    return TRAIN_DIR if int.from_bytes(digest[:8], "big") / 2 ** 64 < TRAIN_SPLIT_RATIO else VAL_DIR
+
+
+def _current_split(processed_dir: Path, image_name: str):
+    out_name = processed_name(image_name)
+    for split in (TRAIN_DIR, VAL_DIR):
+        if (processed_dir / IMAGES_DIR / split / out_name).exists():
+            return split
+    return None
+
+
+def _remove_processed(processed_dir: Path, image_name: str):
+    out_name = PurePosixPath(processed_name(image_name))
+    for split in (TRAIN_DIR, VAL_DIR):
+        (processed_dir / IMAGES_DIR / split / out_name.name).unlink(missing_ok=True)
+        (processed_dir / LABELS_DIR / split / f"{out_name.stem}.txt").unlink(missing_ok=True)
+
+
+def _class_map_from_yaml(processed_dir: Path) -> dict:
+    with open(processed_dir / "data.yaml") as f:
+        names = yaml.safe_load(f)["names"]
+    return {name: idx for idx, name in enumerate(names)}
+
+
+def _read_versions(job_dir: Path) -> list:
+    index_path = job_dir / DATASET_VERSIONS_DIR / DATASET_VERSIONS_INDEX
+    if not index_path.exists():
+        return []
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def snapshot_dataset_version(job_dir: Path) -> str:
+    """
+    Keeps the current dataset state as dataset_versions/d<N>.
+
+    processed/ and the annotation store are linked, not copied; every later
+    write to those files replaces them instead of writing through.
+    """
+    versions = _read_versions(job_dir)
+    version = f"d{len(versions) + 1}"
+    version_dir = job_dir / DATASET_VERSIONS_DIR / version
+
+    materialize_tree(job_dir / PROCESSED_DIR, version_dir / PROCESSED_DIR)
+    materialize(job_dir / ANNOTATION_STORE_FILE, version_dir / ANNOTATION_STORE_FILE)
+    for name in (DATASET_METADATA_FILE, FINGERPRINT_MANIFEST_FILE, DATASET_MANIFEST_FILE):
+        if (job_dir / name).exists():
+            shutil.copyfile(job_dir / name, version_dir / name)
+
+    with open(job_dir / DATASET_METADATA_FILE) as f:
+        metadata = json.load(f)
+
+    versions.append({
+        "version": version,
+        "data_fingerprint": metadata.get("data_fingerprint"),
+        "num_images": metadata.get("num_images"),
+        "num_annotations": metadata.get("num_annotations"),
+        "archived_at_utc": datetime.utcnow().isoformat()
+    })
+
+    with open(job_dir / DATASET_VERSIONS_DIR / DATASET_VERSIONS_INDEX, "w") as f:
+        json.dump(versions, f, indent=2)
+
+    return version
+
+
+def _restore_version(job_dir: Path, version: str):
+    """
+    Puts the job back to the state archived as <version> by
+    snapshot_dataset_version and drops that archive again.
+    """
+    version_dir = job_dir / DATASET_VERSIONS_DIR / version
+
+    shutil.rmtree(job_dir / PROCESSED_DIR, ignore_errors=True)
+    materialize_tree(version_dir / PROCESSED_DIR, job_dir / PROCESSED_DIR)
+    materialize(version_dir / ANNOTATION_STORE_FILE, job_dir / ANNOTATION_STORE_FILE)
+    for name in (DATASET_METADATA_FILE, FINGERPRINT_MANIFEST_FILE, DATASET_MANIFEST_FILE):
+        if (version_dir / name).exists():
+            shutil.copyfile(version_dir / name, job_dir / name)
+        else:
+            (job_dir / name).unlink(missing_ok=True)
+
+    shutil.rmtree(version_dir)
+    versions = [v for v in _read_versions(job_dir) if v["version"] != version]
+    if not versions:
+        shutil.rmtree(job_dir / DATASET_VERSIONS_DIR)
+        return
+    with open(job_dir / DATASET_VERSIONS_DIR / DATASET_VERSIONS_INDEX, "w") as f:
+        json.dump(versions, f, indent=2)
+
+
+def _move_into(src_dir: Path, dest_dir: Path, names: list, backup_dir: Path) -> list:
+    """
+    Moves staged files into dest_dir; files they replace are moved to
+    backup_dir. Returns (name, replaced) for every file moved, in order, so
+    the move can be undone by _move_back.
+    """
+    moved = []
+    for name in names:
+        dest = dest_dir / name
+        replaced = dest.exists()
+        if replaced:
+            (backup_dir / name).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(dest, backup_dir / name)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src_dir / name, dest)
+        moved.append((name, replaced))
+    return moved
+
+
+def _move_back(dest_dir: Path, moved: list, backup_dir: Path):
+    for name, replaced in reversed(moved):
+        if replaced:
+            os.replace(backup_dir / name, dest_dir / name)
+        else:
+            (dest_dir / name).unlink(missing_ok=True)
+
+
+def append_dataset(
+    job_id: str,
+    delta_zip_path: Path,
+    delta_name: str,
+    workers: int = TRANSFORM_WORKERS,
+    io_workers: int = TRANSFORM_IO_WORKERS
+):
+    """
+    Adds a delta archive to an already processed job. delta_zip_path is
+    the verified upload, moved into raw_zip/ as the next delta_<N>_<delta_name>
+    once the delta has been accepted.
+
+    The delta is staged first: extracted aside (for extracted/ jobs),
+    hashed, parsed and header-checked against its XMLs without touching the
+    job. A delta with unreadable images or annotations raises ValueError and
+    leaves the job as it was. Only then is it committed; a failure after
+    that restores the job from the dataset version archived at the start.
+
+    Only new or changed image/XML pairs (by content digest) are scanned and
+    written; new images get a deterministic split, existing ones keep theirs.
+    Metadata and the fingerprint are updated incrementally.
+    """
+    start_time = time.time()
+
+    job_dir = BASE_UPLOAD_DIR / job_id
+    processed_dir = job_dir / PROCESSED_DIR
+    extracted_dir = job_dir / EXTRACTED_DIR
+
+    if not (processed_dir / "data.yaml").exists():
+        raise FileNotFoundError("Dataset not processed yet. Run /preprocess first.")
+
+    # One append at a time per job
+    with open(job_dir / ".append.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        staging_dir = job_dir / f".append-{uuid.uuid4().hex}"
+        staged_files = staging_dir / "files"
+        staging_dir.mkdir()
+
+        try:
+            class_map = _class_map_from_yaml(processed_dir)
+            previous_files = load_manifest(job_dir).get("files", {})
+
+            # extracted/ jobs get the delta extracted aside; ZIP jobs read
+            # the delta archive as one more overlay
+            if extracted_dir.exists():
+                extract_zip_parallel(delta_zip_path, staged_files)
+                source = OverlaySource(DirectorySource(extracted_dir), DirectorySource(staged_files))
+            else:
+                source = ZipSource(find_raw_zips(job_dir) + [delta_zip_path])
+
+            files = source.files()
+            images = [
+                name for name in files
+                if PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS
+            ]
+            collisions = find_name_collisions(images)
+            if collisions:
+                example = sorted(collisions.values())[0]
+                raise ValueError(
+                    f"Delta would give several images the same processed file name, "
+                    f"e.g. {', '.join(example)}; rename them"
+                )
+
+            # Hashed against a copy of the job's fingerprint manifest, so
+            # unchanged files keep their digests and the job's copy is only
+            # replaced on commit
+            if (job_dir / FINGERPRINT_MANIFEST_FILE).exists():
+                shutil.copyfile(job_dir / FINGERPRINT_MANIFEST_FILE, staging_dir / FINGERPRINT_MANIFEST_FILE)
+            fingerprint = compute_data_fingerprint(source, staging_dir, names=[
+                name for name in files
+                if PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS
+                or PurePosixPath(name).suffix.lower() == ANNOTATION_EXTENSION
+            ])
+            current_files = load_manifest(staging_dir)["files"]
+
+            changed = {
+                name for name, entry in current_files.items()
+                if previous_files.get(name, {}).get("sha256") != entry["sha256"]
+            }
+            affected = [
+                name for name in images
+                if name in changed
+                or str(PurePosixPath(name).with_suffix(ANNOTATION_EXTENSION)) in changed
+            ]
+
+            # Raises ValueError naming the XML that does not parse
+            delta = AnnotationStore.from_records(
+                affected, scan_annotations(source, affected, workers)
+            )
+
+            # Same header / XML size checks /preprocess runs, on the new and
+            # changed pairs only; the report stays in the staging area
+            report = validate_image_files(source, staging_dir, affected, store=delta)
+            details = summarize_invalid_images(report)
+            if details:
+                bad = [r["image"] for r in report["files"] if r["status"] != "ok"]
+                raise ValueError(f"Invalid images in delta ({details}): {', '.join(bad[:5])}")
+
+            # Commit: from here on the job is modified
+            previous_version = snapshot_dataset_version(job_dir)
+            moved = []
+            zip_path = None
+            try:
+                if extracted_dir.exists():
+                    moved = _move_into(
+                        staged_files, extracted_dir,
+                        DirectorySource(staged_files).files(), staging_dir / "replaced"
+                    )
+
+                # Named under the lock: deltas are overlaid in this order
+                raw_zip_dir = job_dir / RAW_ZIP_DIR
+                delta_index = len(list(raw_zip_dir.glob(f"{DELTA_ZIP_PREFIX}*.zip"))) + 1
+                zip_path = raw_zip_dir / f"{DELTA_ZIP_PREFIX}{delta_index:04d}_{delta_name}"
+                os.replace(delta_zip_path, zip_path)
+
+                os.replace(staging_dir / FINGERPRINT_MANIFEST_FILE, job_dir / FINGERPRINT_MANIFEST_FILE)
+
+                source = open_dataset_source(job_dir)
+                merged = AnnotationStore.load(job_dir / ANNOTATION_STORE_FILE).merge(delta)
+                merged.save(job_dir / ANNOTATION_STORE_FILE)
+                manifest = build_dataset_manifest(source, job_dir, store=merged, files=files)
+
+                labels = delta.yolo_labels(class_map)
+
+                items = []
+                for name, label_text in zip(affected, labels):
+                    split = _current_split(processed_dir, name) or assign_split(name)
+                    _remove_processed(processed_dir, name)
+                    if label_text is not None:
+                        items.append((name, split, label_text))
+
+                with ThreadPoolExecutor(max_workers=max(1, io_workers)) as pool:
+                    methods = Counter(pool.map(
+                        lambda item: write_processed_item(source, processed_dir, *item),
+                        items
+                    ))
+
+                version = f"d{int(previous_version[1:]) + 1}"
+                generate_dataset_metadata(
+                    job_dir=job_dir,
+                    source=source,
+                    images=images,
+                    store=merged,
+                    class_map=class_map,
+                    extra={
+                        "num_orphan_images": len(manifest["orphan_images"]),
+                        "num_orphan_annotations": len(manifest["orphan_annotations"]),
+                        "dataset_version": version,
+                        "previous_dataset_version": previous_version
+                    }
+                )
+            except BaseException:
+                # A delta left in raw_zip/ or extracted/ would be picked up
+                # by the next /preprocess
+                _move_back(extracted_dir, moved, staging_dir / "replaced")
+                if zip_path is not None:
+                    zip_path.unlink(missing_ok=True)
+                _restore_version(job_dir, previous_version)
+                raise
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    upload_dataset_metadata(job_dir)
+
+    return {
+        "archive": zip_path.name,
+        "dataset_version": version,
+        "previous_dataset_version": previous_version,
+        "data_fingerprint": fingerprint["fingerprint"],
+        "files_rehashed": fingerprint["rehashed"],
+        "images_changed": len(affected),
+        "images_written": len(items),
+        "splits": dict(Counter(split for _, split, _ in items)),
+        "materialized": dict(methods),
+        "seconds": round(time.time() - start_time, 3)
+    }
@@ -0,0 +1,99 @@
+import os
+import fcntl
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from datetime import datetime
+
+from fastapi import UploadFile
+
+from src.constants import (
+    UPLOAD_CHUNK_SIZE,
+    MAX_UPLOAD_SIZE_BYTES,
+    UPLOAD_INFO_FILE
+)
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def _write_chunk(f, sha, chunk: bytes):
+    sha.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload_stream(
+    file: UploadFile,
+    dest_path: Path,
+    max_bytes: int = MAX_UPLOAD_SIZE_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+):
+    """
+    Streams an uploaded file to disk in chunks without blocking the event loop.
+
+    Hashing and disk writes run in a worker thread, so other requests keep
+    being served while a large archive is written.
+
+    Returns:
+        size_bytes (int)
+        sha256 (str)
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(
+            f"Upload exceeds maximum size of {max_bytes} bytes"
+        )
+
+    sha = hashlib.sha256()
+    size = 0
+
+    f = await asyncio.to_thread(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(
+                    f"Upload exceeds maximum size of {max_bytes} bytes"
+                )
+
+            await asyncio.to_thread(_write_chunk, f, sha, chunk)
+    finally:
+        await asyncio.to_thread(f.close)
+
+    return size, sha.hexdigest()
+
+
+def record_upload(job_dir: Path, filename: str, size_bytes: int, sha256: str):
+    """
+    Appends an archive entry to the job's upload record.
+    """
+    info_path = job_dir / UPLOAD_INFO_FILE
+
+    # Concurrent appends of one job record their deltas one at a time
+    with open(job_dir / ".upload.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if info_path.exists():
+            with open(info_path) as f:
+                info = json.load(f)
+        else:
+            info = {"archives": []}
+
+        info["archives"].append({
+            "filename": filename,
+            "size_bytes": size_bytes,
+            "sha256": sha256,
+            "uploaded_at_utc": datetime.utcnow().isoformat()
+        })
+
+        tmp = info_path.with_name(f".{info_path.name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp, info_path)
+
+    return info_path
@@ -1,28 +1,121 @@
+import json
+import time
 import shutil
 import random
-from pathlib import Path
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 from src.constants import *
-from src.utils.xml_parser import parse_voc_xml
-from src.utils.yolo_converter import voc_to_yolo
+from src.utils.annotation_store import AnnotationStore
 from src.utils.yaml_generator import generate_data_yaml
 from src.utils.dataset_metadata import generate_dataset_metadata
 from src.utils.s3_utils import upload_file_to_s3
+from src.utils.dataset_source import open_dataset_source
+from src.utils.fingerprint import compute_data_fingerprint
+from src.utils.dataset_manifest import (
+    load_dataset_manifest,
+    build_dataset_manifest,
+    manifest_files,
+    processed_name
+)
+from src.utils.processed_cache import cache_key, restore_cached_dataset, store_cached_dataset
 from src.constants import DATASET_METADATA_FILE, S3_DATASET_PREFIX
 
 
-def transform_dataset(job_id: str, class_map: dict):
+def upload_dataset_metadata(job_dir: Path):
+    metadata_path = job_dir / DATASET_METADATA_FILE
+
+    upload_file_to_s3(
+        metadata_path,
+        f"{job_dir.name}/{S3_DATASET_PREFIX}/{DATASET_METADATA_FILE}"
+    )
+
+
+def _write_job_metadata(job_dir: Path, cached_metadata: dict):
+    metadata = dict(cached_metadata)
+    metadata["cached_from_job_id"] = metadata.get("job_id")
+    metadata["job_id"] = job_dir.name
+    metadata["created_at_utc"] = datetime.utcnow().isoformat()
+
+    with open(job_dir / DATASET_METADATA_FILE, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    upload_dataset_metadata(job_dir)
+
+
+def write_processed_item(source, processed_dir: Path, img_name: str, split: str, label_text: str):
+    out_name = PurePosixPath(processed_name(img_name))
+    label_file = processed_dir / LABELS_DIR / split / f"{out_name.stem}.txt"
+
+    # may be a hardlink into the processed-dataset cache
+    label_file.unlink(missing_ok=True)
+    with open(label_file, "w") as f:
+        f.write(label_text)
+
+    # reflink/hardlink from extracted/, or straight from the ZIP member
+    return source.copy_to(
+        img_name,
+        processed_dir / IMAGES_DIR / split / out_name.name
+    )
+
+
+def transform_dataset(
+    job_id: str,
+    class_map: dict,
+    source=None,
+    manifest: dict = None,
+    workers: int = TRANSFORM_WORKERS,
+    io_workers: int = TRANSFORM_IO_WORKERS,
+    use_cache: bool = True
+):
+
+    start_time = time.time()
 
     job_dir = BASE_UPLOAD_DIR / job_id
-    extracted_dir = job_dir / EXTRACTED_DIR
     processed_dir = job_dir / PROCESSED_DIR
 
+    # extracted/ directory or the raw ZIP itself
+    if source is None:
+        source = open_dataset_source(job_dir)
+
+    # File listing, pairs and parsed annotations come from the manifest
+    # built at validation time; nothing here walks the dataset again
+    if manifest is None:
+        manifest = (
+            load_dataset_manifest(job_dir)
+            or build_dataset_manifest(source, job_dir, workers=workers)
+        )
+
+    # Identical content + class map + split settings => identical output,
+    # so a previous job's processed tree can be linked in as-is
+    fingerprint = compute_data_fingerprint(
+        source, job_dir, names=manifest_files(manifest)
+    )["fingerprint"]
+    key = cache_key(fingerprint, class_map)
+
+    # Start from a clean tree so outputs of an earlier class map do not linger
+    shutil.rmtree(processed_dir, ignore_errors=True)
+
+    if use_cache:
+        cached_metadata = restore_cached_dataset(key, job_dir)
+        if cached_metadata is not None:
+            generate_data_yaml(processed_dir, class_map)
+            _write_job_metadata(job_dir, cached_metadata)
+            return {
+                "cache": "hit",
+                "images_total": cached_metadata.get("num_images"),
+                "images_processed": cached_metadata.get("num_labeled_images"),
+                "seconds": round(time.time() - start_time, 3)
+            }
+
     # Create YOLO directory structure
     for split in [TRAIN_DIR, VAL_DIR]:
         (processed_dir / IMAGES_DIR / split).mkdir(parents=True, exist_ok=True)
         (processed_dir / LABELS_DIR / split).mkdir(parents=True, exist_ok=True)
 
-    images = [p for p in extracted_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
+    images = list(manifest["images"])
 
     if len(images) == 0:
         raise ValueError("No images found in extracted dataset")
@@ -31,48 +124,54 @@ def transform_dataset(job_id: str, class_map: dict):
     random.shuffle(images)
 
     split_idx = int(len(images) * TRAIN_SPLIT_RATIO)
-    train_imgs = images[:split_idx]
-    val_imgs = images[split_idx:]
-
-    def process_split(image_list, split):
-        for img_path in image_list:
-            xml_path = img_path.with_suffix(ANNOTATION_EXTENSION)
-
-            if not xml_path.exists():
-                continue
-
-            img_w, img_h, objects = parse_voc_xml(xml_path)
+    splits = [TRAIN_DIR] * split_idx + [VAL_DIR] * (len(images) - split_idx)
 
-            if len(objects) == 0:
-                continue
+    # The XMLs were parsed once into the columnar store; labels are
+    # batched array operations on it, mapped back to the shuffled order
+    store = AnnotationStore.load(job_dir / ANNOTATION_STORE_FILE)
+    labels_by_image = dict(zip(store.images.tolist(), store.yolo_labels(class_map)))
+    labels = [labels_by_image[name] for name in images]
 
-            label_file = processed_dir / LABELS_DIR / split / f"{img_path.stem}.txt"
+    items = [
+        (img_name, split, label_text)
+        for img_name, split, label_text in zip(images, splits, labels)
+        if label_text is not None
+    ]
 
-            with open(label_file, "w") as f:
-                for obj in objects:
-                    if obj["label"] not in class_map:
-                        continue
+    # File copies are I/O bound: a thread pool is enough
+    with ThreadPoolExecutor(max_workers=max(1, io_workers)) as pool:
+        methods = Counter(pool.map(
+            lambda item: write_processed_item(source, processed_dir, *item),
+            items
+        ))
 
-                    class_id = class_map[obj["label"]]
-                    x, y, w, h = voc_to_yolo(obj["bbox"], img_w, img_h)
-                    f.write(f"{class_id} {x} {y} {w} {h}\n")
+    elapsed = time.time() - start_time
 
-            shutil.copy(
-                img_path,
-                processed_dir / IMAGES_DIR / split / img_path.name
-            )
-
-    process_split(train_imgs, TRAIN_DIR)
-    process_split(val_imgs, VAL_DIR)
     generate_data_yaml(processed_dir, class_map)
 
 
 # After dataset processing + data.yaml generation
-    generate_dataset_metadata(job_dir=job_dir, extracted_dir=extracted_dir)
-    metadata_path = job_dir / DATASET_METADATA_FILE
-
-    upload_file_to_s3(
-        metadata_path,
-        f"{job_dir.name}/{S3_DATASET_PREFIX}/{DATASET_METADATA_FILE}"
+    generate_dataset_metadata(
+        job_dir=job_dir,
+        source=source,
+        images=manifest["images"],
+        store=store,
+        class_map=class_map,
+        extra={
+            "num_orphan_images": len(manifest["orphan_images"]),
+            "num_orphan_annotations": len(manifest["orphan_annotations"])
+        }
     )
-
+    upload_dataset_metadata(job_dir)
+
+    if use_cache:
+        store_cached_dataset(key, job_dir)
+
+    return {
+        "cache": "miss" if use_cache else "disabled",
+        "images_total": len(images),
+        "images_processed": len(items),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(len(items) / elapsed, 2) if elapsed > 0 else None,
+        "materialized": dict(methods)
+    }
@@ -1,15 +1,116 @@
+import os
+import json
 from pathlib import Path
-from src.constants import IMAGE_EXTENSIONS, ANNOTATION_EXTENSION, MIN_IMAGES_REQUIRED
+from functools import partial
+from datetime import datetime
+from collections import Counter
 
-def validate_extracted_dataset(extracted_dir: Path):
-    images = []
-    xmls = []
+from src.constants import (
+    MIN_IMAGES_REQUIRED,
+    ANNOTATION_STORE_FILE,
+    IMAGE_VALIDATION_WORKERS,
+    IMAGE_VALIDATION_REPORT_FILE
+)
+from src.utils.annotation_store import AnnotationStore
+from src.utils.dataset_source import DirectorySource
+from src.utils.dataset_manifest import get_dataset_manifest, find_name_collisions
+from src.utils.image_header import inspect_image
+from src.utils.parallel import parallel_map
 
-    for file in extracted_dir.rglob("*"):
-        if file.suffix.lower() in IMAGE_EXTENSIONS:
-            images.append(file)
-        elif file.suffix.lower() == ANNOTATION_EXTENSION:
-            xmls.append(file)
+
+def check_image_headers(source, images: list, workers: int = IMAGE_VALIDATION_WORKERS):
+    """
+    Reads only the header and end marker of every image, in a process
+    pool for large datasets. Results are aligned with images.
+    """
+    return parallel_map(partial(inspect_image, source), images, workers)
+
+
+def validate_image_files(
+    source,
+    job_dir: Path,
+    images: list,
+    store: AnnotationStore = None,
+    workers: int = IMAGE_VALIDATION_WORKERS
+) -> dict:
+    """
+    Flags unreadable, truncated and mis-sized images and writes a per-file
+    report to validation_report.json in the job directory.
+
+    An image is mis-sized when its real dimensions differ from the
+    <size> in its VOC XML (labels are normalised by the XML size).
+    """
+    if store is None:
+        store = AnnotationStore.load(job_dir / ANNOTATION_STORE_FILE)
+
+    results = check_image_headers(source, images, workers)
+
+    rows = store.index_of(images).tolist()
+    widths = store.widths.tolist()
+    heights = store.heights.tolist()
+    has_xml = store.has_xml.tolist()
+
+    for result, row in zip(results, rows):
+        if "error" in result:
+            result["status"] = "unreadable"
+            continue
+
+        if has_xml[row]:
+            result["xml_width"] = widths[row]
+            result["xml_height"] = heights[row]
+
+        if result["truncated"]:
+            result["status"] = "truncated"
+        elif has_xml[row] and (result["width"], result["height"]) != (widths[row], heights[row]):
+            result["status"] = "size_mismatch"
+        else:
+            result["status"] = "ok"
+
+    summary = Counter(result["status"] for result in results)
+    report = {
+        "created_at_utc": datetime.utcnow().isoformat(),
+        "num_images": len(results),
+        "summary": {
+            status: summary.get(status, 0)
+            for status in ("ok", "unreadable", "truncated", "size_mismatch")
+        },
+        "files": results
+    }
+
+    report_path = job_dir / IMAGE_VALIDATION_REPORT_FILE
+    tmp_path = report_path.with_name(f".{report_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, report_path)
+
+    return report
+
+
+def summarize_invalid_images(report: dict) -> str:
+    """
+    e.g. "2 truncated, 1 unreadable"; empty when every image is ok.
+    """
+    return ", ".join(
+        f"{count} {status}" for status, count in report["summary"].items()
+        if status != "ok" and count
+    )
+
+
+def validate_extracted_dataset(
+    source,
+    manifest: dict = None,
+    job_dir: Path = None,
+    check_images: bool = True
+):
+    if isinstance(source, Path):
+        job_dir = job_dir or source.parent
+        source = DirectorySource(source)
+
+    if manifest is None:
+        manifest = get_dataset_manifest(source, job_dir)
+
+    images = manifest["images"]
+    xmls = manifest["annotations"]
 
     if len(images) < MIN_IMAGES_REQUIRED:
         raise ValueError("Not enough images for training")
@@ -17,4 +118,20 @@ def validate_extracted_dataset(extracted_dir: Path):
     if len(xmls) == 0:
         raise ValueError("No XML annotations found")
 
+    collisions = find_name_collisions(images)
+    if collisions:
+        example = sorted(collisions.values())[0]
+        raise ValueError(
+            f"{len(collisions)} processed file names are claimed by several images, "
+            f"e.g. {', '.join(example)}; rename them"
+        )
+
+    if check_images:
+        report = validate_image_files(source, job_dir, images)
+        details = summarize_invalid_images(report)
+        if details:
+            raise ValueError(
+                f"Invalid images ({details}); see {IMAGE_VALIDATION_REPORT_FILE}"
+            )
+
     return images, xmls
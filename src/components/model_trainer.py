@@ -1,12 +1,20 @@
-from ultralytics import YOLO
 from pathlib import Path
-import mlflow
 import json
 import time
-import shutil
-from src.utils.versioning import get_next_version, update_latest_version
+from src.utils.versioning import (
+    allocate_version,
+    finish_version,
+    get_latest_version,
+    update_latest_version,
+    promotion_lock
+)
 from src.constants import RUNS_DIR
-from src.utils.s3_utils import upload_file_to_s3
+from src.utils.s3_utils import upload_files_to_s3
+from src.utils.artifact_uploads import enqueue_artifact_upload
+from src.utils.file_materializer import materialize
+from src.utils.resized_dataset import build_resized_dataset
+from src.utils.job_status import write_progress
+from src.utils.mlflow_logger import MlflowRunLogger
 
 from src.constants import (
     BASE_UPLOAD_DIR,
@@ -16,18 +24,58 @@ from src.constants import (
     DEFAULT_IMGSZ,
     DEFAULT_BATCH,
     DEFAULT_MODEL,
-    MLFLOW_EXPERIMENT_NAME,
-    MLFLOW_TRACKING_URI,
+    DEFAULT_WORKERS,
+    PRE_RESIZE_IMAGES,
+    S3_ASYNC_UPLOADS,
+    DATASET_METADATA_FILE,
+    STATUS_FAILED
 )
 
 
+def _epoch_metrics(trainer, epoch_seconds: float, elapsed: float) -> dict:
+    """
+    Loss, validation metrics, ETA and throughput for the epoch that just
+    ended, as plain floats.
+    """
+    metrics = {}
+
+    if getattr(trainer, "tloss", None) is not None and hasattr(trainer, "label_loss_items"):
+        metrics.update(trainer.label_loss_items(trainer.tloss, prefix="train"))
+    metrics.update(getattr(trainer, "metrics", None) or {})
+    metrics = {key: round(float(value), 5) for key, value in metrics.items()}
+
+    epoch = trainer.epoch + 1
+    metrics["epoch_seconds"] = round(epoch_seconds, 3)
+    metrics["eta_seconds"] = round(elapsed / epoch * (trainer.epochs - epoch), 1)
+
+    loader = getattr(trainer, "train_loader", None)
+    if loader is not None and epoch_seconds > 0:
+        metrics["images_per_sec"] = round(len(loader.dataset) / epoch_seconds, 2)
+
+    return metrics
+
+
+def _dataset_fingerprint(job_dir: Path):
+    metadata_path = job_dir / DATASET_METADATA_FILE
+    if not metadata_path.exists():
+        return None
+    with open(metadata_path) as f:
+        return json.load(f).get("data_fingerprint")
+
+
 def train_yolo_model(
     job_id: str,
     epochs: int = DEFAULT_EPOCHS,
     imgsz: int = DEFAULT_IMGSZ,
     batch: int = DEFAULT_BATCH,
-    model_name: str = DEFAULT_MODEL
+    model_name: str = DEFAULT_MODEL,
+    pre_resize: bool = PRE_RESIZE_IMAGES,
+    workers: int = DEFAULT_WORKERS,
+    async_upload: bool = S3_ASYNC_UPLOADS
 ):
+    # Imported here so that importing this module (e.g. from the API) does
+    # not load torch; only training processes pay for it
+    from ultralytics import YOLO
 
     # -----------------------------
     # Paths
@@ -41,15 +89,16 @@ def train_yolo_model(
     if not data_yaml.exists():
         raise FileNotFoundError("data.yaml not found. Dataset not ready.")
 
-    # -----------------------------
-    # MLflow setup
-    # -----------------------------
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-    mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
+    # Train on copies already downscaled to imgsz (built once per size)
+    if pre_resize:
+        data_yaml = build_resized_dataset(job_dir, imgsz)
 
     start_time = time.time()
 
-    with mlflow.start_run(run_name=job_id):
+    # -----------------------------
+    # MLflow run (spooled to disk, sent in the background)
+    # -----------------------------
+    with MlflowRunLogger(run_name=job_id, tags={"job_id": job_id}) as tracker:
 
         # -----------------------------
         # Log params
@@ -58,110 +107,179 @@ def train_yolo_model(
             "epochs": epochs,
             "imgsz": imgsz,
             "batch": batch,
-            "model": model_name
+            "model": model_name,
+            "pre_resize": pre_resize,
+            "workers": workers
         }
-        mlflow.log_params(params)
-
-        # -----------------------------
-        # Train YOLO
-        # -----------------------------
-        model = YOLO(model_name)
-
-        results = model.train(
-            data=str(data_yaml),
-            epochs=epochs,
-            imgsz=imgsz,
-            batch=batch,
-            project=str(artifacts_dir),
-            name="train",
-            exist_ok=True
-        )
-
-        # -----------------------------
-        # Resolve best.pt
-        # -----------------------------
-        save_dir = Path(results.save_dir)
-        best_model_path = save_dir / "weights" / "best.pt"
-
-
-        # version
-        version = get_next_version(artifacts_dir)
-
-        run_dir = artifacts_dir / RUNS_DIR / version
-        model_dir = run_dir / "model"
-        model_dir.mkdir(parents=True, exist_ok=True)
-
-        registry_model_path = model_dir / "best.pt"
-        shutil.copy(best_model_path, registry_model_path)
-
-        if not best_model_path.exists():
-            raise RuntimeError(
-                f"Training completed but best.pt not found at {best_model_path}"
+        tracker.log_params(params)
+
+        # Reserved up front: concurrent trainings of this job each get
+        # their own version and their own ultralytics run directory
+        fingerprint = _dataset_fingerprint(job_dir)
+        version = allocate_version(job_id, fingerprint, params)
+        tracker.log_params({"version": version, "data_fingerprint": fingerprint})
+
+        # Any way out of here other than completion fails the version (a
+        # kill or cancel is handled by the worker: fail_abandoned_versions)
+        try:
+            # -----------------------------
+            # Train YOLO
+            # -----------------------------
+            model = YOLO(model_name)
+
+            # Per-epoch events go to the job registry, which the API streams
+            # to dashboards (/jobs/{job_id}/stream)
+            epoch_started = {"at": time.time()}
+            last_metrics = {}
+
+            def start_epoch(trainer):
+                epoch_started["at"] = time.time()
+
+            def record_epoch(trainer):
+                now = time.time()
+                epoch = trainer.epoch + 1
+                metrics = _epoch_metrics(trainer, now - epoch_started["at"], now - start_time)
+                write_progress(
+                    job_dir,
+                    stage="training",
+                    epoch=epoch,
+                    total_epochs=trainer.epochs,
+                    progress=round(epoch / trainer.epochs, 4),
+                    data=metrics
+                )
+                tracker.log_metrics(metrics, step=epoch)
+                last_metrics.update(metrics)
+
+            def drop_builtin_mlflow(trainer):
+                # ultralytics' own MLflow integration logs synchronously from
+                # the training loop; the tracker above replaces it
+                for event, callbacks in trainer.callbacks.items():
+                    trainer.callbacks[event] = [
+                        callback for callback in callbacks
+                        if "mlflow" not in getattr(callback, "__module__", "")
+                    ]
+
+            model.add_callback("on_pretrain_routine_start", drop_builtin_mlflow)
+            model.add_callback("on_train_epoch_start", start_epoch)
+            model.add_callback("on_fit_epoch_end", record_epoch)
+
+            results = model.train(
+                data=str(data_yaml),
+                epochs=epochs,
+                imgsz=imgsz,
+                batch=batch,
+                workers=workers,
+                project=str(artifacts_dir),
+                name=f"train_{version}",
+                exist_ok=True
             )
 
-        # -----------------------------
-        # Copy model to registry
-        # -----------------------------
-        model_registry_dir = artifacts_dir / "model"
-        model_registry_dir.mkdir(exist_ok=True)
-        registry_model_path = model_registry_dir / "best.pt"
-
-        shutil.copy(best_model_path, registry_model_path)
-
-        # -----------------------------
-        # Create metadata (DEFINE FIRST)
-        # -----------------------------
-        metrics = {
-            "version": version,
-            "training_time_sec": round(time.time() - start_time, 2),
-            "best_model_path": str(registry_model_path)
-        }
-
-
-        # -----------------------------
-        # Write metadata to disk
-        # -----------------------------
-        # metrics_path = artifacts_dir / "metrics.json"
-        # params_path = artifacts_dir / "params.json"
-        metrics_path = run_dir / "metrics.json"
-        params_path = run_dir / "params.json"
-
-
-        with open(metrics_path, "w") as f:
-            json.dump(metrics, f, indent=2)
-
-        with open(params_path, "w") as f:
-            json.dump(params, f, indent=2)
-
-        update_latest_version(artifacts_dir, version)
-
-
-        # -----------------------------
-        # Log artifacts to MLflow
-        # -----------------------------
-        mlflow.log_artifact(str(registry_model_path), artifact_path="model")
-        mlflow.log_artifact(str(metrics_path), artifact_path="metadata")
-        mlflow.log_artifact(str(params_path), artifact_path="metadata")
-        s3_base_key = f"{job_id}/runs/{version}"
-
-        upload_file_to_s3(
-            registry_model_path,
-            f"{s3_base_key}/model/best.pt"
-        )
-
-        upload_file_to_s3(
-            metrics_path,
-            f"{s3_base_key}/metrics.json"
-        )
-
-        upload_file_to_s3(
-            params_path,
-            f"{s3_base_key}/params.json"
-        )
-
-
-        
-
+            write_progress(job_dir, stage="saving_artifacts")
+
+            # -----------------------------
+            # Resolve best.pt
+            # -----------------------------
+            save_dir = Path(results.save_dir)
+            best_model_path = save_dir / "weights" / "best.pt"
+
+            run_dir = artifacts_dir / RUNS_DIR / version
+            model_dir = run_dir / "model"
+            model_dir.mkdir(parents=True, exist_ok=True)
+
+            if not best_model_path.exists():
+                raise RuntimeError(
+                    f"Training completed but best.pt not found at {best_model_path}"
+                )
+
+            # ultralytics rewrites weights/best.pt in place on the next run
+            # with the same name, so never hardlink to it
+            version_model_path = model_dir / "best.pt"
+            materialize(best_model_path, version_model_path, allow_hardlink=False)
+
+            model_registry_dir = artifacts_dir / "model"
+            model_registry_dir.mkdir(exist_ok=True)
+            registry_model_path = model_registry_dir / "best.pt"
+
+            # -----------------------------
+            # Create metadata (DEFINE FIRST)
+            # -----------------------------
+            metrics = {
+                "version": version,
+                "training_time_sec": round(time.time() - start_time, 2),
+                "best_model_path": str(registry_model_path)
+            }
+
+
+            # -----------------------------
+            # Write metadata to disk
+            # -----------------------------
+            # metrics_path = artifacts_dir / "metrics.json"
+            # params_path = artifacts_dir / "params.json"
+            metrics_path = run_dir / "metrics.json"
+            params_path = run_dir / "params.json"
+
+
+            with open(metrics_path, "w") as f:
+                json.dump(metrics, f, indent=2)
+
+            with open(params_path, "w") as f:
+                json.dump(params, f, indent=2)
+
+            # -----------------------------
+            # Log artifacts to MLflow
+            # -----------------------------
+            # Versioned copies: they may be sent after this process has exited
+            tracker.log_metrics({"training_time_sec": metrics["training_time_sec"]})
+            tracker.log_artifact(version_model_path, artifact_path="model")
+            tracker.log_artifact(metrics_path, artifact_path="metadata")
+            tracker.log_artifact(params_path, artifact_path="metadata")
+
+            # -----------------------------
+            # Upload artifacts to S3
+            # -----------------------------
+            s3_base_key = f"{job_id}/runs/{version}"
+
+            # Versioned copies: artifacts/model/best.pt is replaced by the next
+            # run, possibly before a queued upload has read it
+            s3_files = [
+                (version_model_path, f"{s3_base_key}/model/best.pt"),
+                (metrics_path, f"{s3_base_key}/metrics.json"),
+                (params_path, f"{s3_base_key}/params.json")
+            ]
+
+            # Async: the training worker uploads after this process exits,
+            # so the training slot is not held for network transfers
+            upload_id = None
+            if async_upload:
+                upload_id = enqueue_artifact_upload(job_id, version, s3_files)
+            else:
+                upload_files_to_s3(s3_files)
+
+            # Validation of best.pt when ultralytics reports it, else the last epoch
+            final_metrics = dict(last_metrics)
+            final_metrics.update(getattr(results, "results_dict", None) or {})
+
+            # Completed (visible to latest/best) only once everything above
+            # succeeded; completion and promotion are one step per job
+            with promotion_lock(job_id):
+                finish_version(
+                    job_id,
+                    version,
+                    metrics=final_metrics,
+                    s3_key=f"{job_id}/runs/{version}/model/best.pt",
+                    model_path=version_model_path
+                )
+
+                # -----------------------------
+                # Copy model to registry
+                # -----------------------------
+                # Unless another training of this job completed a later version
+                if get_latest_version(job_id) == version:
+                    materialize(version_model_path, registry_model_path)
+                    update_latest_version(artifacts_dir, version)
+        except BaseException:
+            finish_version(job_id, version, STATUS_FAILED)
+            raise
 
         # -----------------------------
         # FINAL RETURN (last line)
@@ -171,6 +289,7 @@ def train_yolo_model(
         "version": version,
         "model_path": str(registry_model_path),
         "metrics_path": str(metrics_path),
-        "params_path": str(params_path)
+        "params_path": str(params_path),
+        "upload_id": upload_id
          }
 
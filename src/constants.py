@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Base directory MUST be a Path object
@@ -22,23 +23,74 @@ RANDOM_SEED = 42
 MIN_IMAGES_REQUIRED = 5
 
 
+# ---------- Image Validation ----------
+IMAGE_VALIDATION_WORKERS = os.cpu_count() or 1   # header-check processes
+IMAGE_VALIDATION_REPORT_FILE = "validation_report.json"
+
+
 # ---------- Training Defaults ----------
 DEFAULT_EPOCHS = 50
 DEFAULT_IMGSZ = 640
 DEFAULT_BATCH = 16
 DEFAULT_MODEL = "yolov8n.pt"
+DEFAULT_WORKERS = 8        # dataloader workers (ultralytics default)
+
+# ---------- Resized Image Cache ----------
+# Images downscaled once per imgsz instead of on every epoch
+PRE_RESIZE_IMAGES = False
+RESIZED_DIR = "resized"
+RESIZED_INDEX_FILE = "resized.json"
+RESIZE_WORKERS = os.cpu_count() or 1
+RESIZE_JPEG_QUALITY = 95
 
 # ---------- MLflow ----------
 MLFLOW_EXPERIMENT_NAME = "VIS_APP_YOLO"
-MLFLOW_TRACKING_URI = "http://localhost:5000"
+# e.g. sqlite:///mlflow.db to log to the local SQLite backend
+MLFLOW_TRACKING_URI = os.environ.get("MLFLOW_TRACKING_URI", "http://localhost:5000")
+MLFLOW_SPOOL_DIR = Path("data/mlflow_spool")
+MLFLOW_FLUSH_SECONDS = 5.0            # how often queued records are sent
+MLFLOW_BATCH_SIZE = 1000              # metrics + params per log_batch (MLflow's limit)
+MLFLOW_PARAMS_BATCH_SIZE = 100        # params per log_batch (MLflow's limit)
+MLFLOW_RETRY_MAX_SECONDS = 60.0       # backoff cap while the server is down
+MLFLOW_CLOSE_TIMEOUT_SECONDS = 10.0   # then the training worker replays the rest
+MLFLOW_REPLAY_SECONDS = 60.0
 
 # ---------- Job Status ----------
+STATUS_UPLOADED = "uploaded"
+STATUS_PREPROCESSING = "preprocessing"
+STATUS_PREPROCESSED = "preprocessed"
 STATUS_PENDING = "pending"
 STATUS_RUNNING = "running"
 STATUS_COMPLETED = "completed"
 STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+STATUS_FILE = "status.json"            # per-job mirror of the registry row
+JOB_REGISTRY_DB = Path("data/jobs.db")
+JOBS_PAGE_SIZE = 50
+JOBS_MAX_PAGE_SIZE = 500
 
-STATUS_FILE = "status.json"
+# ---------- Progress Streaming ----------
+EVENT_POLL_SECONDS = 0.5        # registry tail interval, shared by all clients
+EVENT_QUEUE_SIZE = 1000         # buffered events per client
+SSE_HEARTBEAT_SECONDS = 15
+
+# ---------- Training Queue ----------
+TRAIN_QUEUE_DB = Path("data/train_queue.db")
+TRAIN_WORKER_CONCURRENCY = 1         # trainings running at the same time
+TRAIN_QUEUE_POLL_SECONDS = 2.0
+TRAIN_QUEUE_MAX_ATTEMPTS = 3         # restarts after crashes before giving up
+TRAIN_CANCEL_GRACE_SECONDS = 30      # SIGTERM -> SIGKILL on cancel
+TRAIN_DEFAULT_PRIORITY = 0
+
+# ---------- Resource Scheduling ----------
+# CPU share per training; None splits the host's cores evenly between
+# TRAIN_WORKER_CONCURRENCY slots
+TRAIN_CPUS_PER_JOB = None
+TRAIN_PIN_CPUS = True                        # sched_setaffinity to the share
+TRAIN_MEM_FRACTION = 0.85                    # of MemTotal usable by trainings
+TRAIN_MEM_BASE_BYTES = 2 * 1024 ** 3         # per-training baseline estimate
+TRAIN_MEM_PER_PIXEL_BYTES = 64               # per batch * imgsz^2 pixel
 # ---------- Versioning ----------
 RUNS_DIR = "runs"
 LATEST_FILE = "latest.json"
@@ -46,7 +98,91 @@ VERSION_PREFIX = "v"
 
 # ---------- Dataset Metadata ----------
 DATASET_METADATA_FILE = "dataset_metadata.json"
+ANNOTATION_STORE_FILE = "annotations.npz"
+DATASET_MANIFEST_FILE = "dataset_manifest.json"
+DATASET_VERSIONS_DIR = "dataset_versions"
+DATASET_VERSIONS_INDEX = "index.json"
 # ---------- S3 ----------
 S3_BUCKET_NAME = "vis-app-ml-artifacts"
 S3_ARTIFACT_PREFIX = ""
 S3_DATASET_PREFIX = "dataset"
+# Set to a MinIO / moto server URL to use a local S3 stand-in
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024   # multipart above this size
+S3_MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+S3_MAX_CONCURRENCY = 10                      # parts in flight per file
+S3_UPLOAD_WORKERS = 4                        # files in flight per batch
+S3_UPLOAD_ATTEMPTS = 3
+S3_RETRY_BACKOFF_SECONDS = 1.0
+# Training artifacts are uploaded by the training worker after the
+# training process has exited, so the training slot is freed first
+S3_ASYNC_UPLOADS = True
+S3_ASYNC_UPLOAD_WORKERS = 2                  # upload batches in flight
+# A failed batch (e.g. S3 outage) is re-queued with doubling delays
+S3_ASYNC_UPLOAD_MAX_ATTEMPTS = 10
+S3_ASYNC_UPLOAD_RETRY_SECONDS = 30
+S3_ASYNC_UPLOAD_RETRY_MAX_SECONDS = 3600
+S3_STREAM_CHUNK_SIZE = 1024 * 1024            # bytes per chunk when streaming downloads
+
+# ---------- Upload ----------
+UPLOAD_CHUNK_SIZE = 1024 * 1024            # 1 MiB per read/write
+MAX_UPLOAD_SIZE_BYTES = 10 * 1024 ** 3     # 10 GiB
+UPLOAD_INFO_FILE = "upload.json"
+DELTA_ZIP_PREFIX = "delta_"
+
+# ---------- Extraction ----------
+EXTRACT_WORKERS = min(32, os.cpu_count() or 1)
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+MAX_ARCHIVE_MEMBERS = 200_000
+MAX_UNCOMPRESSED_BYTES = 50 * 1024 ** 3   # 50 GiB
+MAX_COMPRESSION_RATIO = 200               # per member, uncompressed / compressed
+# When False, uploads are only verified and every stage reads the raw ZIP
+EXTRACT_ON_UPLOAD = True
+
+# ---------- Transformation ----------
+TRANSFORM_WORKERS = os.cpu_count() or 1      # XML parsing / label generation processes
+TRANSFORM_IO_WORKERS = 8                     # image copy threads
+
+# ---------- Process Pools ----------
+# Items per parallel_map task; inputs of at most one chunk run inline
+PARALLEL_MAP_CHUNK_SIZE = 256
+
+# ---------- Materialization ----------
+# Tried in order for files that never change after they are written
+MATERIALIZE_METHODS = ("reflink", "hardlink", "copy")
+
+# ---------- Fingerprinting ----------
+FINGERPRINT_MANIFEST_FILE = "fingerprint_manifest.json"
+FINGERPRINT_WORKERS = 8
+FINGERPRINT_READ_SIZE = 4 * 1024 * 1024
+
+# ---------- Processed Dataset Cache ----------
+PROCESSED_CACHE_DIR = Path("data/cache/processed")
+PROCESSED_CACHE_MAX_BYTES = 50 * 1024 ** 3   # 50 GiB
+PROCESSED_CACHE_ENTRY_FILE = "entry.json"
+PROCESSED_CACHE_STATS_FILE = "stats.json"
+
+# ---------- Artifact Download Cache ----------
+ARTIFACT_CACHE_ENABLED = True
+ARTIFACT_CACHE_DIR = Path("data/cache/artifacts")
+ARTIFACT_CACHE_MAX_BYTES = 20 * 1024 ** 3   # 20 GiB
+ARTIFACT_CACHE_ENTRY_FILE = "entry.json"
+ARTIFACT_CACHE_OBJECT_FILE = "object"
+ARTIFACT_CACHE_STATS_FILE = "stats.json"
+ARTIFACT_CACHE_FILL_WORKERS = 2              # background fills after a streamed miss
+
+# ---------- Inference ----------
+PREDICT_MODEL_CACHE_SIZE = 4                 # loaded models kept at most
+PREDICT_MODEL_MEMORY_BYTES = 4 * 1024 ** 3   # budget for loaded models
+PREDICT_MODEL_MEMORY_FACTOR = 4              # resident bytes per weights byte
+PREDICT_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+PREDICT_LOAD_WORKERS = 2                     # cold model loads (fetch, load, warm-up)
+PREDICT_TORCH_THREADS = None                 # None: torch default
+PREDICT_DEFAULT_CONF = 0.25
+PREDICT_MAX_IMAGES = 16                      # per request
+PREDICT_LATENCY_WINDOW = 1000                # samples kept per model
+# Micro-batching: concurrent requests for one model share a forward pass
+# of up to MAX_IMAGES images, started at most MAX_WAIT after the oldest
+PREDICT_BATCH_MAX_IMAGES = int(os.environ.get("PREDICT_BATCH_MAX_IMAGES", 16))
+PREDICT_BATCH_MAX_WAIT_SECONDS = float(os.environ.get("PREDICT_BATCH_MAX_WAIT_SECONDS", 0.005))
+PREDICT_THROUGHPUT_WINDOW_SECONDS = 60       # images/s measured over
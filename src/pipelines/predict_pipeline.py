@@ -0,0 +1,468 @@
+import time
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from src.constants import (
+    BASE_UPLOAD_DIR,
+    ARTIFACTS_DIR,
+    RUNS_DIR,
+    ARTIFACT_CACHE_DIR,
+    DEFAULT_IMGSZ,
+    PREDICT_MODEL_CACHE_SIZE,
+    PREDICT_MODEL_MEMORY_BYTES,
+    PREDICT_MODEL_MEMORY_FACTOR,
+    PREDICT_WORKERS,
+    PREDICT_LOAD_WORKERS,
+    PREDICT_TORCH_THREADS,
+    PREDICT_DEFAULT_CONF,
+    PREDICT_BATCH_MAX_IMAGES,
+    PREDICT_BATCH_MAX_WAIT_SECONDS
+)
+from src.utils.versioning import get_latest_version, get_model_version
+from src.utils.s3_utils import head_s3_object, download_file_from_s3
+from src.utils.artifact_cache import open_artifact
+from src.utils.metrics import LatencyTracker, RateMeter
+
+
+@contextmanager
+def model_weights(job_id: str, version: str):
+    """
+    Path of the version's best.pt while it is loaded: the local copy
+    written by training, else a private copy of the S3 object (through the
+    artifact cache), removed afterwards. FileNotFoundError if neither exists.
+    """
+    local_path = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR / RUNS_DIR / version / "model" / "best.pt"
+    if local_path.exists():
+        yield local_path
+        return
+
+    registered = get_model_version(job_id, version)
+    s3_key = (registered or {}).get("s3_key") or f"{job_id}/runs/{version}/model/best.pt"
+    try:
+        head = head_s3_object(s3_key)
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 404:
+            raise FileNotFoundError(f"Model {job_id}/{version} not found")
+        raise
+
+    # Never the training-owned path above: the download cache trusts it
+    # as an immutable copy of what training wrote
+    ARTIFACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(prefix=".load_", dir=ARTIFACT_CACHE_DIR) as tmp:
+        path = Path(tmp) / "best.pt"
+        cached = open_artifact(s3_key, head["ETag"], head["ContentLength"])
+        if cached is None:
+            # Larger than the whole cache budget (or replaced mid-fetch)
+            download_file_from_s3(path, s3_key)
+        else:
+            # Copied from the open file: the entry may be evicted meanwhile
+            with cached, open(path, "wb") as f:
+                shutil.copyfileobj(cached, f, 1024 * 1024)
+        yield path
+
+
+def _decode_image(data: bytes):
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Not a decodable image")
+    return image
+
+
+def _detections(result, conf: float) -> list:
+    boxes = result.boxes
+    return [
+        {
+            "class_id": int(cls),
+            "class_name": result.names.get(int(cls), str(int(cls))),
+            "confidence": round(float(score), 4),
+            "box": [round(float(v), 1) for v in xyxy]
+        }
+        for xyxy, score, cls in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())
+        if score >= conf
+    ]
+
+
+class LoadedModel:
+    """
+    A YOLO model ready for inference. ultralytics models are not safe to
+    call from several threads at once, so calls are serialized per model;
+    torch still spreads each call over its intra-op threads.
+    """
+
+    def __init__(self, job_id: str, version: str, path: Path, imgsz: int):
+        from ultralytics import YOLO
+
+        self.job_id = job_id
+        self.version = version
+        self.path = Path(path)
+        self.imgsz = imgsz
+        self.memory_bytes = self.path.stat().st_size * PREDICT_MODEL_MEMORY_FACTOR
+        self.model = YOLO(str(path))
+        self.lock = threading.Lock()
+        self.loaded_at = time.time()
+
+    def warm_up(self):
+        """
+        One inference on a blank image: builds the graph and allocates
+        buffers before the first real request.
+        """
+        import numpy as np
+
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def predict(self, images: list, conf=PREDICT_DEFAULT_CONF) -> list:
+        """
+        One forward pass over all images. conf is a threshold, or one per
+        image: the pass runs at the lowest and each image's detections are
+        then filtered at its own (NMS never lets a lower score suppress a
+        higher one, so this matches separate passes).
+        """
+        confs = conf if isinstance(conf, (list, tuple)) else [conf] * len(images)
+        with self.lock:
+            results = self.model.predict(images, conf=min(confs), imgsz=self.imgsz, verbose=False)
+        return [_detections(result, image_conf) for result, image_conf in zip(results, confs)]
+
+
+class ModelCache:
+    """
+    LRU of loaded models bounded by count and by estimated memory. The
+    model being returned is never evicted; concurrent first requests for
+    one model load it once.
+    """
+
+    def __init__(
+        self,
+        max_models: int = PREDICT_MODEL_CACHE_SIZE,
+        max_bytes: int = PREDICT_MODEL_MEMORY_BYTES
+    ):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()   # (job_id, version) -> LoadedModel
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._loading = {}            # (job_id, version) -> threading.Lock
+
+    def lookup(self, job_id: str, version: str):
+        """
+        The loaded model, or None; never loads and never waits on a load.
+        """
+        key = (job_id, version)
+        with self._lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                self.hits += 1
+            return model
+
+    def get(self, job_id: str, version: str) -> LoadedModel:
+        key = (job_id, version)
+        model = self.lookup(job_id, version)
+        if model is not None:
+            return model
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            try:
+                model = self.lookup(job_id, version)
+                if model is not None:
+                    return model
+
+                registered = get_model_version(job_id, version) or {}
+                imgsz = (registered.get("params") or {}).get("imgsz", DEFAULT_IMGSZ)
+                with model_weights(job_id, version) as path:
+                    model = LoadedModel(job_id, version, path, imgsz)
+                model.warm_up()
+
+                with self._lock:
+                    self.models[key] = model
+                    self.loads += 1
+                    self._evict(keep=key)
+            finally:
+                # Also after a failed load (e.g. unknown version), which
+                # the next request retries
+                with self._lock:
+                    self._loading.pop(key, None)
+        return model
+
+    def _evict(self, keep):
+        used = sum(model.memory_bytes for model in self.models.values())
+        for key in list(self.models):
+            if len(self.models) <= self.max_models and used <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Requests already holding it finish; memory is freed after
+            used -= self.models.pop(key).memory_bytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "memory_bytes": sum(model.memory_bytes for model in self.models.values()),
+                "max_bytes": self.max_bytes,
+                "max_models": self.max_models,
+                "models": [
+                    {
+                        "job_id": model.job_id,
+                        "version": model.version,
+                        "imgsz": model.imgsz,
+                        "memory_bytes": model.memory_bytes,
+                        "loaded_at": model.loaded_at
+                    }
+                    for model in reversed(self.models.values())
+                ]
+            }
+
+
+class _BatchRequest:
+    def __init__(self, model: LoadedModel, images: list, conf: float, future):
+        self.model = model
+        self.images = images
+        self.conf = conf
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Dynamic batching for one model, on the event loop. Concurrent requests
+    are queued and run together as one forward pass of up to max_images
+    images, started once the batch is full or the oldest request has waited
+    max_wait. One batch runs at a time per model (the model is serialized
+    anyway), so under load the queue keeps filling while the previous pass
+    runs and batches grow by themselves; when idle, a request waits at most
+    max_wait. Bound to the event loop it is first used on.
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        max_images: int = PREDICT_BATCH_MAX_IMAGES,
+        max_wait: float = PREDICT_BATCH_MAX_WAIT_SECONDS
+    ):
+        self.executor = executor
+        self.max_images = max_images
+        self.max_wait = max_wait
+        self.requests = 0
+        self.images = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.queue_wait = LatencyTracker()
+        self.forward = LatencyTracker()
+        self._queue = deque()    # _BatchRequest
+        self._queued_images = 0
+        self._running = False
+        self._timer = None
+        self._task = None
+        self.loop = None
+
+    async def submit(self, model: LoadedModel, images: list, conf: float) -> list:
+        """
+        Detections for each image, once the batch holding them has run.
+        """
+        self.loop = asyncio.get_running_loop()
+        future = self.loop.create_future()
+        self._queue.append(_BatchRequest(model, images, conf, future))
+        self._queued_images += len(images)
+        self.requests += 1
+        self._schedule()
+        return await future
+
+    def _schedule(self):
+        if self._running or not self._queue:
+            return
+        waited = time.perf_counter() - self._queue[0].enqueued
+        if self._queued_images < self.max_images and waited < self.max_wait:
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(
+                    self.max_wait - waited, self._on_timer
+                )
+            return
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._running = True
+        self._task = asyncio.ensure_future(self._run(self._take()))
+
+    def _on_timer(self):
+        self._timer = None
+        self._schedule()
+
+    def _take(self) -> list:
+        """
+        Oldest requests that fit in max_images (always at least one, so a
+        request larger than a batch still runs, on its own).
+        """
+        batch = [self._queue.popleft()]
+        size = len(batch[0].images)
+        while self._queue and size + len(self._queue[0].images) <= self.max_images:
+            size += len(self._queue[0].images)
+            batch.append(self._queue.popleft())
+        self._queued_images -= size
+        self.full_batches += size >= self.max_images
+        return batch
+
+    async def _run(self, batch: list):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        for request in batch:
+            self.queue_wait.observe("batch", started - request.enqueued)
+
+        images = [image for request in batch for image in request.images]
+        confs = [request.conf for request in batch for _ in request.images]
+        try:
+            # Requests loaded before an eviction may hold another instance
+            # of the same weights; any of them serves the batch
+            results = await loop.run_in_executor(
+                self.executor, batch[0].model.predict, images, confs
+            )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        else:
+            self.forward.observe("batch", time.perf_counter() - started)
+            self.batches += 1
+            self.images += len(images)
+            start = 0
+            for request in batch:
+                end = start + len(request.images)
+                if not request.future.done():   # client gone
+                    request.future.set_result(results[start:end])
+                start = end
+        finally:
+            self._running = False
+            self._schedule()
+
+    def stats(self) -> dict:
+        queue_wait = self.queue_wait.snapshot().get("batch", {})
+        forward = self.forward.snapshot().get("batch", {})
+        return {
+            "requests": self.requests,
+            "images": self.images,
+            "batches": self.batches,
+            "full_batches": self.full_batches,
+            "mean_batch_images": round(self.images / self.batches, 2) if self.batches else None,
+            "queued_images": self._queued_images,
+            "max_images": self.max_images,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_wait_p50_ms": queue_wait.get("p50_ms"),
+            "queue_wait_p99_ms": queue_wait.get("p99_ms"),
+            "forward_p50_ms": forward.get("p50_ms"),
+            "forward_p99_ms": forward.get("p99_ms")
+        }
+
+
+class Predictor:
+    """
+    Serves predictions from the API process. Image decoding runs on a
+    thread pool; inference goes through one MicroBatcher per model, whose
+    forward passes run on the same pool. Cold model loads (S3 fetch, YOLO
+    load, warm-up) run on a separate small pool, so they never hold the
+    threads loaded models infer on; requests for a model being loaded all
+    await the one load on the event loop. Nothing blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        workers: int = PREDICT_WORKERS,
+        cache: ModelCache = None,
+        max_batch_images: int = PREDICT_BATCH_MAX_IMAGES,
+        max_batch_wait: float = PREDICT_BATCH_MAX_WAIT_SECONDS,
+        load_workers: int = PREDICT_LOAD_WORKERS
+    ):
+        self.cache = cache or ModelCache()
+        self.latency = LatencyTracker()
+        self.throughput = RateMeter()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict")
+        self.loader = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix="predict-load")
+        self.max_batch_images = max_batch_images
+        self.max_batch_wait = max_batch_wait
+        self.batchers = {}   # "job_id/version" -> MicroBatcher
+        self._loads = {}     # (job_id, version) -> asyncio future of the load
+        self._torch_configured = False
+
+    def _prepare(self, job_id: str, version: str, images: list):
+        if PREDICT_TORCH_THREADS and not self._torch_configured:
+            import torch
+            torch.set_num_threads(PREDICT_TORCH_THREADS)
+            self._torch_configured = True
+
+        decoded = [_decode_image(data) for data in images]
+        return version or get_latest_version(job_id), decoded
+
+    async def _model(self, job_id: str, version: str) -> LoadedModel:
+        model = self.cache.lookup(job_id, version)
+        if model is not None:
+            return model
+
+        loop = asyncio.get_running_loop()
+        key = (job_id, version)
+        load = self._loads.get(key)
+        if load is None or load.get_loop() is not loop:
+            load = self._loads[key] = loop.run_in_executor(
+                self.loader, self.cache.get, job_id, version
+            )
+            load.add_done_callback(
+                lambda done: self._loads.pop(key, None) if self._loads.get(key) is done else None
+            )
+        # Shared by every waiting request: one leaving must not cancel it
+        return await asyncio.shield(load)
+
+    async def predict(
+        self,
+        job_id: str,
+        version: str,
+        images: list,
+        conf: float = PREDICT_DEFAULT_CONF
+    ) -> dict:
+        """
+        images are encoded image bytes. version None means the latest
+        completed version. Latency is recorded per model, queueing included.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        version, decoded = await loop.run_in_executor(
+            self.executor, self._prepare, job_id, version, images
+        )
+        model = await self._model(job_id, version)
+
+        key = f"{job_id}/{version}"
+        batcher = self.batchers.get(key)
+        if batcher is None or batcher.loop not in (None, asyncio.get_running_loop()):
+            # Only one loop per process under uvicorn; a stale batcher
+            # finishes its queued requests on its own loop
+            batcher = self.batchers[key] = MicroBatcher(
+                self.executor, self.max_batch_images, self.max_batch_wait
+            )
+        predictions = await batcher.submit(model, decoded, conf)
+
+        self.latency.observe(key, time.perf_counter() - start)
+        self.throughput.add(key, len(images))
+        return {"job_id": job_id, "version": version, "predictions": predictions}
+
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "latency": self.latency.snapshot(),
+            "throughput": self.throughput.snapshot(),
+            "batching": {key: batcher.stats() for key, batcher in list(self.batchers.items())}
+        }
@@ -5,25 +5,45 @@ from src.constants import (
     BASE_UPLOAD_DIR,
     STATUS_RUNNING,
     STATUS_COMPLETED,
-    STATUS_FAILED
+    STATUS_FAILED,
+    PRE_RESIZE_IMAGES,
+    DEFAULT_WORKERS
 )
 
 
-def run_training_job(job_id: str, epochs: int, imgsz: int, batch: int, model: str):
+def run_training_job(
+    job_id: str,
+    epochs: int,
+    imgsz: int,
+    batch: int,
+    model: str,
+    pre_resize: bool = PRE_RESIZE_IMAGES,
+    workers: int = DEFAULT_WORKERS
+):
     job_dir = BASE_UPLOAD_DIR / job_id
 
     try:
-        write_status(job_dir, STATUS_RUNNING, "Training started")
+        write_status(
+            job_dir, STATUS_RUNNING, "Training started",
+            stage="training", progress=0.0, epoch=0, total_epochs=epochs
+        )
 
         train_yolo_model(
             job_id=job_id,
             epochs=epochs,
             imgsz=imgsz,
             batch=batch,
-            model_name=model
+            model_name=model,
+            pre_resize=pre_resize,
+            workers=workers
         )
 
-        write_status(job_dir, STATUS_COMPLETED, "Training completed successfully")
+        write_status(
+            job_dir, STATUS_COMPLETED, "Training completed successfully",
+            stage="done", progress=1.0
+        )
 
     except Exception as e:
         write_status(job_dir, STATUS_FAILED, str(e))
+        # non-zero exit code for the queue worker
+        raise
@@ -0,0 +1,247 @@
+import os
+import time
+import fcntl
+import signal
+import ctypes
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.job_status import read_status, write_status
+from src.utils.mlflow_logger import replay_mlflow_spools
+from src.utils.versioning import fail_abandoned_versions
+from src.utils.resource_scheduler import ResourceScheduler, apply_allocation
+from src.utils.artifact_uploads import (
+    claim_artifact_uploads,
+    recover_artifact_uploads,
+    run_artifact_upload
+)
+from src.utils.job_queue import (
+    peek_next,
+    claim_next,
+    finish_entry,
+    cancel_requested_ids,
+    recover_interrupted
+)
+from src.constants import (
+    BASE_UPLOAD_DIR,
+    TRAIN_QUEUE_DB,
+    TRAIN_WORKER_CONCURRENCY,
+    TRAIN_QUEUE_POLL_SECONDS,
+    TRAIN_CANCEL_GRACE_SECONDS,
+    S3_ASYNC_UPLOAD_WORKERS,
+    MLFLOW_REPLAY_SECONDS,
+    STATUS_PENDING,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_CANCELLED
+)
+
+
+# Linux prctl option: signal sent to this process when its parent dies
+PR_SET_PDEATHSIG = 1
+
+
+def _die_with_supervisor(supervisor_pid: int):
+    """
+    A training must not outlive a killed supervisor: the restarted one
+    re-queues the job and would otherwise train it twice.
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except (OSError, AttributeError):  # not Linux
+        pass
+    if os.getppid() != supervisor_pid:
+        os._exit(1)
+
+
+def _run_entry(entry: dict, allocation: dict):
+    """
+    Child process entry point: one training per process, so its memory
+    (model, dataloaders, CUDA context) is returned to the OS when it ends.
+    """
+    _die_with_supervisor(entry["worker_pid"])
+
+    # Thread counts and affinity must be set before torch is imported
+    apply_allocation(allocation)
+    from src.pipelines.train_pipeline import run_training_job
+
+    params = {**entry["params"], "workers": allocation["workers"]}
+    run_training_job(entry["job_id"], **params)
+
+
+def _reap(queue_id: int, proc, entry: dict, cancelled: bool, db_path: Path):
+    """
+    Records how an exited training process ended.
+    """
+    proc.join()
+    job_dir = BASE_UPLOAD_DIR / entry["job_id"]
+    if proc.exitcode != 0:
+        # A killed training cannot fail its model version itself
+        fail_abandoned_versions(
+            owner_pid=proc.pid,
+            state=STATUS_CANCELLED if cancelled else STATUS_FAILED
+        )
+
+    if cancelled:
+        finish_entry(queue_id, STATUS_CANCELLED, db_path=db_path)
+        write_status(job_dir, STATUS_CANCELLED, "Training cancelled")
+    elif proc.exitcode == 0:
+        finish_entry(queue_id, STATUS_COMPLETED, db_path=db_path)
+    else:
+        error = f"Training process exited with code {proc.exitcode}"
+        finish_entry(queue_id, STATUS_FAILED, error, db_path=db_path)
+        # run_training_job records its own exceptions; this
+        # covers processes that were killed (e.g. OOM)
+        if read_status(job_dir).get("status") != STATUS_FAILED:
+            write_status(job_dir, STATUS_FAILED, error)
+
+
+def _record_recovered(entries: list, reason: str):
+    """
+    Job status for entries recover_interrupted put back in the queue (or
+    ended), so /status does not keep showing them as training.
+    """
+    for entry in entries:
+        job_dir = BASE_UPLOAD_DIR / entry["job_id"]
+        if entry["state"] == STATUS_PENDING:
+            write_status(job_dir, STATUS_PENDING, f"Re-queued after {reason}")
+        else:
+            write_status(job_dir, entry["state"], f"Interrupted by {reason}")
+
+
+def run_worker(
+    concurrency: int = TRAIN_WORKER_CONCURRENCY,
+    poll_seconds: float = TRAIN_QUEUE_POLL_SECONDS,
+    db_path: Path = TRAIN_QUEUE_DB
+):
+    """
+    Supervisor loop: runs up to `concurrency` queued trainings, each in its
+    own process with its own CPU share and memory reservation, until
+    SIGTERM/SIGINT.
+
+    Artifact uploads queued by finished trainings run on a thread pool
+    here, after the training process (and its CPU share) is released, as
+    do replays of MLflow records a training could not deliver.
+
+    Only one supervisor may own a queue. On startup, entries left running
+    by a crashed or killed supervisor are put back in the queue.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    lock = open(db_path.with_name(f"{db_path.name}.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise RuntimeError(f"Another training worker already owns {db_path}")
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    _record_recovered(recover_interrupted(db_path), "worker restart")
+
+    recover_artifact_uploads()
+    fail_abandoned_versions()
+
+    ctx = multiprocessing.get_context("spawn")
+    scheduler = ResourceScheduler(concurrency)
+    running = {}   # queue id -> (process, entry)
+    cancelled = {}   # queue id -> time after which it is killed
+    uploader = ThreadPoolExecutor(max_workers=S3_ASYNC_UPLOAD_WORKERS)
+    uploads = set()
+    mlflow_replay = None
+    next_replay = 0.0
+
+    try:
+        while not stopping:
+            # Reap finished trainings
+            for queue_id, (proc, entry) in list(running.items()):
+                if proc.is_alive():
+                    continue
+                del running[queue_id]
+                scheduler.release(queue_id)
+                _reap(queue_id, proc, entry, queue_id in cancelled, db_path)
+                cancelled.pop(queue_id, None)
+
+            # Stop cancelled trainings: SIGTERM now, SIGKILL once the grace
+            # period is over; reaped by a later iteration, never waited on
+            now = time.time()
+            for queue_id in cancel_requested_ids(db_path) & running.keys() - cancelled.keys():
+                running[queue_id][0].terminate()
+                cancelled[queue_id] = now + TRAIN_CANCEL_GRACE_SECONDS
+            for queue_id, kill_at in cancelled.items():
+                proc = running[queue_id][0]
+                if now >= kill_at and proc.is_alive():
+                    proc.kill()
+
+            # Admit queued trainings in order while resources are free
+            while True:
+                head = peek_next(db_path)
+                if head is None:
+                    break
+                allocation = scheduler.try_allocate(head["id"], head["params"])
+                if allocation is None:
+                    break
+                entry = claim_next(os.getpid(), db_path, queue_id=head["id"])
+                if entry is None:  # cancelled meanwhile
+                    scheduler.release(head["id"])
+                    continue
+                proc = ctx.Process(
+                    target=_run_entry,
+                    args=(entry, allocation),
+                    name=f"train-{entry['job_id']}"
+                )
+                proc.start()
+                running[entry["id"]] = (proc, entry)
+
+            # Upload artifacts of finished trainings
+            uploads = {future for future in uploads if not future.done()}
+            for upload in claim_artifact_uploads(S3_ASYNC_UPLOAD_WORKERS - len(uploads)):
+                uploads.add(uploader.submit(run_artifact_upload, upload))
+
+            # Send MLflow records that trainings could not deliver
+            if (mlflow_replay is None or mlflow_replay.done()) and time.time() >= next_replay:
+                mlflow_replay = uploader.submit(replay_mlflow_spools)
+                next_replay = time.time() + MLFLOW_REPLAY_SECONDS
+
+            time.sleep(poll_seconds)
+    finally:
+        # Trainings that ended on their own are recorded as usual; the
+        # others are stopped together and re-queued without using up an
+        # attempt (cancelled ones end cancelled)
+        for queue_id, (proc, entry) in list(running.items()):
+            if not proc.is_alive():
+                del running[queue_id]
+                _reap(queue_id, proc, entry, queue_id in cancelled, db_path)
+
+        for proc, _ in running.values():
+            proc.terminate()
+        deadline = time.time() + TRAIN_CANCEL_GRACE_SECONDS
+        for proc, _ in running.values():
+            proc.join(max(0.0, deadline - time.time()))
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+            fail_abandoned_versions(owner_pid=proc.pid)
+
+        _record_recovered(recover_interrupted(db_path, clean_shutdown=True), "worker shutdown")
+        # Uploads in flight are finished rather than re-queued
+        uploader.shutdown(wait=True)
+        lock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VIS_APP training worker")
+    parser.add_argument("--concurrency", type=int, default=TRAIN_WORKER_CONCURRENCY)
+    parser.add_argument("--poll-seconds", type=float, default=TRAIN_QUEUE_POLL_SECONDS)
+    args = parser.parse_args()
+
+    run_worker(concurrency=args.concurrency, poll_seconds=args.poll_seconds)
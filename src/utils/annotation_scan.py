@@ -0,0 +1,43 @@
+import xml.etree.ElementTree as ET
+from pathlib import PurePosixPath
+from functools import partial
+
+from src.constants import ANNOTATION_EXTENSION, TRANSFORM_WORKERS
+from src.utils.parallel import parallel_map
+from src.utils.xml_parser import parse_voc_xml
+
+
+def scan_image(source, img_name: str):
+    """
+    Parses the VOC XML paired with an image.
+
+    Returns None when the image has no XML, otherwise a record:
+        {"image", "width", "height", "objects"}
+    """
+    xml_name = str(PurePosixPath(img_name).with_suffix(ANNOTATION_EXTENSION))
+
+    if not source.exists(xml_name):
+        return None
+
+    try:
+        with source.open(xml_name) as xml_file:
+            img_w, img_h, objects = parse_voc_xml(xml_file)
+    except (ET.ParseError, ValueError, AttributeError, TypeError) as e:
+        # Missing tags surface as None.text / int(None)
+        raise ValueError(f"Invalid annotation {xml_name}: {e}") from e
+
+    return {
+        "image": img_name,
+        "width": img_w,
+        "height": img_h,
+        "objects": objects
+    }
+
+
+def scan_annotations(source, images: list, workers: int = TRANSFORM_WORKERS):
+    """
+    Single pass over every image's XML, shared by label writing and metadata.
+
+    XML parsing is CPU bound, so large datasets are parsed in a process pool.
+    """
+    return parallel_map(partial(scan_image, source), images, workers)
@@ -0,0 +1,196 @@
+import os
+import numpy as np
+from pathlib import Path
+
+from src.utils.yolo_converter import voc_to_yolo_batch
+
+
+class AnnotationStore:
+    """
+    Columnar view of a dataset's parsed annotations.
+
+    Per image:  images (names), widths, heights, has_xml, num_objects
+    Per box:    box_image (index into images), box_label (index into
+                labels), boxes (xmin, ymin, xmax, ymax in pixels)
+
+    Persisted as .npz next to dataset_metadata.json so labels and
+    statistics can be rebuilt without re-parsing XML.
+    """
+
+    def __init__(self, images, widths, heights, has_xml, num_objects,
+                 labels, box_image, box_label, boxes):
+        self.images = np.asarray(images, dtype=str)
+        self.widths = np.asarray(widths, dtype=np.int32)
+        self.heights = np.asarray(heights, dtype=np.int32)
+        self.has_xml = np.asarray(has_xml, dtype=bool)
+        self.num_objects = np.asarray(num_objects, dtype=np.int32)
+        self.labels = np.asarray(labels, dtype=str)
+        self.box_image = np.asarray(box_image, dtype=np.int32)
+        self.box_label = np.asarray(box_label, dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+    @classmethod
+    def from_records(cls, images: list, records: list):
+        """
+        Builds the store from scan_annotations output (aligned with images).
+        """
+        widths, heights, has_xml, num_objects = [], [], [], []
+        label_ids = {}
+        box_image, box_label, boxes = [], [], []
+
+        for idx, record in enumerate(records):
+            if record is None:
+                widths.append(0)
+                heights.append(0)
+                has_xml.append(False)
+                num_objects.append(0)
+                continue
+
+            widths.append(record["width"])
+            heights.append(record["height"])
+            has_xml.append(True)
+            num_objects.append(len(record["objects"]))
+
+            for obj in record["objects"]:
+                box_image.append(idx)
+                box_label.append(label_ids.setdefault(obj["label"], len(label_ids)))
+                boxes.append(obj["bbox"])
+
+        return cls(
+            images, widths, heights, has_xml, num_objects,
+            list(label_ids), box_image, box_label, boxes
+        )
+
+    @classmethod
+    def load(cls, path: Path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def save(self, path: Path):
+        # Written aside and renamed: the old file may be hardlinked into
+        # the processed-dataset cache
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as f:
+            self._savez(f)
+        os.replace(tmp, path)
+        return path
+
+    def _savez(self, f):
+        np.savez_compressed(
+            f,
+            images=self.images,
+            widths=self.widths,
+            heights=self.heights,
+            has_xml=self.has_xml,
+            num_objects=self.num_objects,
+            labels=self.labels,
+            box_image=self.box_image,
+            box_label=self.box_label,
+            boxes=self.boxes
+        )
+
+    def merge(self, delta: "AnnotationStore") -> "AnnotationStore":
+        """
+        Returns a new store where the delta's images replace any existing
+        rows with the same name and new images are appended at the end.
+        """
+        keep = ~np.isin(self.images, delta.images)
+        new_index = np.cumsum(keep) - 1
+        box_keep = keep[self.box_image] if len(self.box_image) else np.zeros(0, dtype=bool)
+
+        labels = self.labels.tolist()
+        lookup = {label: i for i, label in enumerate(labels)}
+        for label in delta.labels.tolist():
+            if label not in lookup:
+                lookup[label] = len(labels)
+                labels.append(label)
+        remap = np.array([lookup[label] for label in delta.labels.tolist()], dtype=np.int32)
+
+        n_kept = int(keep.sum())
+        return AnnotationStore(
+            images=np.concatenate([self.images[keep], delta.images]),
+            widths=np.concatenate([self.widths[keep], delta.widths]),
+            heights=np.concatenate([self.heights[keep], delta.heights]),
+            has_xml=np.concatenate([self.has_xml[keep], delta.has_xml]),
+            num_objects=np.concatenate([self.num_objects[keep], delta.num_objects]),
+            labels=labels,
+            box_image=np.concatenate([
+                new_index[self.box_image[box_keep]],
+                delta.box_image + n_kept
+            ]),
+            box_label=np.concatenate([
+                self.box_label[box_keep],
+                remap[delta.box_label] if len(remap) else delta.box_label
+            ]),
+            boxes=np.concatenate([self.boxes[box_keep], delta.boxes])
+        )
+
+    def label_counts(self) -> dict:
+        """
+        Number of parsed boxes per label, sorted by label.
+        """
+        counts = np.bincount(self.box_label, minlength=len(self.labels))
+        return {
+            label: int(count)
+            for label, count in sorted(zip(self.labels.tolist(), counts.tolist()))
+        }
+
+    def index_of(self, images: list):
+        lookup = {name: i for i, name in enumerate(self.images.tolist())}
+        return np.array([lookup[name] for name in images], dtype=np.int64)
+
+    def class_ids(self, class_map: dict):
+        """
+        Per-box class id from class_map, -1 for labels not in the map.
+        """
+        vocab = np.array(
+            [class_map.get(label, -1) for label in self.labels.tolist()],
+            dtype=np.int64
+        )
+        return vocab[self.box_label] if len(vocab) else np.zeros(0, dtype=np.int64)
+
+    def yolo_boxes(self, class_map: dict):
+        """
+        Batched conversion of every box.
+
+        Returns:
+            class_ids (M,), yolo (M, 4), box_image (M,)
+            for the boxes that are in class_map and non-empty after clipping.
+        """
+        yolo, valid = voc_to_yolo_batch(
+            self.boxes,
+            self.widths[self.box_image],
+            self.heights[self.box_image]
+        )
+        class_ids = self.class_ids(class_map)
+        keep = valid & (class_ids >= 0)
+
+        return class_ids[keep], yolo[keep], self.box_image[keep]
+
+    def yolo_labels(self, class_map: dict):
+        """
+        YOLO label text per image, aligned with self.images.
+
+        None for images without an XML or without valid objects
+        (these are skipped), otherwise the (possibly empty) label text.
+        """
+        class_ids, yolo, box_image = self.yolo_boxes(class_map)
+
+        # tolist() yields Python ints/floats, so the text matches voc_to_yolo
+        rows = [
+            f"{c} {x} {y} {w} {h}\n"
+            for c, (x, y, w, h) in zip(class_ids.tolist(), yolo.tolist())
+        ]
+
+        labels = [
+            "" if n > 0 else None
+            for n in self.num_objects.tolist()
+        ]
+
+        # box_image is sorted (boxes are appended image by image)
+        bounds = np.searchsorted(box_image, np.arange(len(self.images) + 1))
+        for idx in np.flatnonzero(np.diff(bounds)).tolist():
+            labels[idx] = "".join(rows[bounds[idx]:bounds[idx + 1]])
+
+        return labels
@@ -0,0 +1,270 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from src.constants import (
+    ARTIFACT_CACHE_DIR,
+    ARTIFACT_CACHE_MAX_BYTES,
+    ARTIFACT_CACHE_ENTRY_FILE,
+    ARTIFACT_CACHE_OBJECT_FILE,
+    ARTIFACT_CACHE_STATS_FILE,
+    ARTIFACT_CACHE_FILL_WORKERS
+)
+from src.utils.file_materializer import materialize
+from src.utils.disk_cache import cache_lock, read_json, write_json, bump_stats, list_entries, evict_lru
+from src.utils.s3_utils import download_file_from_s3, head_s3_object, s3_etag
+
+_EMPTY_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "local_fills": 0,
+    "evictions": 0,
+    "bytes_fetched": 0,
+    "fill_errors": 0
+}
+
+# Background fills for misses served straight from S3; created on first use
+_fill_pool = None
+_filling = set()
+_fill_lock = threading.Lock()
+
+
+def entry_name(s3_key: str, etag: str) -> str:
+    # A new upload under the same key gets a new ETag, hence a new entry
+    return hashlib.sha256(f"{s3_key}\0{etag}".encode()).hexdigest()
+
+
+def _bump(cache_dir: Path, max_bytes: int = None, **counters):
+    bump_stats(cache_dir / ARTIFACT_CACHE_STATS_FILE, _EMPTY_STATS, max_bytes=max_bytes, **counters)
+
+
+def _entries(cache_dir: Path):
+    return list_entries(cache_dir, ARTIFACT_CACHE_ENTRY_FILE)
+
+
+def _open_cached(cache_dir: Path, entry_dir: Path, **counters):
+    """
+    Opens a cached entry's object and marks it as used, under the cache
+    lock so it cannot be evicted in between. None if it is not cached.
+    """
+    with cache_lock(cache_dir / ".lock"):
+        entry_path = entry_dir / ARTIFACT_CACHE_ENTRY_FILE
+        entry = read_json(entry_path, None)
+        if entry is None:
+            return None
+        f = open(entry_dir / ARTIFACT_CACHE_OBJECT_FILE, "rb")
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        write_json(entry_path, entry)
+        _bump(cache_dir, **counters)
+    return f
+
+
+def open_artifact(
+    s3_key: str,
+    etag: str,
+    size: int,
+    local_copy: Path = None,
+    cache_dir: Path = ARTIFACT_CACHE_DIR,
+    max_bytes: int = ARTIFACT_CACHE_MAX_BYTES
+):
+    """
+    Read-through cache in front of download_file_from_s3.
+
+    Returns an open binary file of a local copy of the object with this
+    ETag, fetching it on a miss, or None if it cannot be cached (larger
+    than the whole budget, or replaced in S3 while it was fetched). The
+    file stays readable even if the entry is evicted or replaced while it
+    is being read.
+    local_copy is an immutable file that may hold the same bytes (e.g. the
+    versioned best.pt of a training on this host); it is used instead of
+    S3 when its computed ETag matches.
+
+    Concurrent misses on one object, in this process or another, wait on a
+    per-entry lock and are served by the first fetch.
+    """
+    if size > max_bytes:
+        return None
+
+    name = entry_name(s3_key, etag)
+    entry_dir = cache_dir / name
+
+    f = _open_cached(cache_dir, entry_dir, hits=1)
+    if f is not None:
+        return f
+
+    # Removed when the fetch is done, so objects that never get cached
+    # leave no lock file behind
+    with cache_lock(cache_dir / f".fetch_{name}.lock", remove=True):
+        f = _open_cached(cache_dir, entry_dir, hits=1, coalesced=1)
+        if f is not None:
+            return f
+
+        staging = cache_dir / f".staging_{name}_{uuid.uuid4().hex[:8]}"
+        staged = staging / ARTIFACT_CACHE_OBJECT_FILE
+        filled_locally = False
+        try:
+            if local_copy is not None and Path(local_copy).is_file() \
+                    and Path(local_copy).stat().st_size == size \
+                    and s3_etag(local_copy) == etag:
+                materialize(local_copy, staged)
+                filled_locally = True
+            else:
+                download_file_from_s3(staged, s3_key)
+                # Replaced mid-download: the bytes may not match the ETag
+                if head_s3_object(s3_key)["ETag"] != etag:
+                    return None
+
+            now = time.time()
+            write_json(staging / ARTIFACT_CACHE_ENTRY_FILE, {
+                "s3_key": s3_key,
+                "etag": etag,
+                "size_bytes": staged.stat().st_size,
+                "created": now,
+                "last_used": now,
+                "hits": 0
+            })
+
+            with cache_lock(cache_dir / ".lock"):
+                # Older versions of the same key are never served again
+                for old_dir, old in _entries(cache_dir):
+                    if old["s3_key"] == s3_key and old_dir != entry_dir:
+                        shutil.rmtree(old_dir, ignore_errors=True)
+                if not entry_dir.exists():
+                    os.rename(staging, entry_dir)
+                    _bump(
+                        cache_dir,
+                        max_bytes=max_bytes,
+                        misses=1,
+                        local_fills=int(filled_locally),
+                        bytes_fetched=0 if filled_locally else size
+                    )
+                    evict_artifact_cache(cache_dir, max_bytes, locked=True, keep=entry_dir)
+                return open(entry_dir / ARTIFACT_CACHE_OBJECT_FILE, "rb")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def open_cached_artifact(s3_key: str, etag: str, cache_dir: Path = ARTIFACT_CACHE_DIR):
+    """
+    Open file of the cached object with this ETag, or None on a miss.
+    Never fetches; see fill_artifact_cache.
+    """
+    return _open_cached(cache_dir, cache_dir / entry_name(s3_key, etag), hits=1)
+
+
+def _fill(name: str, s3_key: str, etag: str, size: int, local_copy, cache_dir: Path, max_bytes: int):
+    try:
+        f = open_artifact(s3_key, etag, size, local_copy, cache_dir, max_bytes)
+        if f is not None:
+            f.close()
+    except Exception:
+        # The request was served from S3; the next miss tries again
+        _bump(cache_dir, fill_errors=1)
+    finally:
+        with _fill_lock:
+            _filling.discard(name)
+
+
+def fill_artifact_cache(
+    s3_key: str,
+    etag: str,
+    size: int,
+    local_copy: Path = None,
+    cache_dir: Path = ARTIFACT_CACHE_DIR,
+    max_bytes: int = ARTIFACT_CACHE_MAX_BYTES
+):
+    """
+    Fetches the object into the cache on a background thread, for callers
+    that serve the miss themselves (straight from S3) instead of waiting
+    for the whole object to reach the disk.
+
+    A fill already running in this process for the same entry is not
+    started again; fills in other processes coalesce on the fetch lock.
+    """
+    global _fill_pool
+
+    if size > max_bytes:
+        return
+
+    name = entry_name(s3_key, etag)
+    with _fill_lock:
+        if name in _filling:
+            return
+        _filling.add(name)
+        if _fill_pool is None:
+            _fill_pool = ThreadPoolExecutor(
+                max_workers=ARTIFACT_CACHE_FILL_WORKERS,
+                thread_name_prefix="artifact-cache-fill"
+            )
+
+    _fill_pool.submit(_fill, name, s3_key, etag, size, local_copy, cache_dir, max_bytes)
+
+
+def fetch_artifact(
+    s3_key: str,
+    etag: str,
+    size: int,
+    local_copy: Path = None,
+    cache_dir: Path = ARTIFACT_CACHE_DIR,
+    max_bytes: int = ARTIFACT_CACHE_MAX_BYTES
+):
+    """
+    Like open_artifact, but returns the cached path (or None) for readers
+    that need one. The entry may be evicted before the path is opened, so
+    a FileNotFoundError from it means: fetch again.
+    """
+    f = open_artifact(s3_key, etag, size, local_copy, cache_dir, max_bytes)
+    if f is None:
+        return None
+    f.close()
+    return Path(f.name)
+
+
+def evict_artifact_cache(
+    cache_dir: Path = ARTIFACT_CACHE_DIR,
+    max_bytes: int = ARTIFACT_CACHE_MAX_BYTES,
+    locked: bool = False,
+    keep: Path = None
+) -> int:
+    """
+    Removes least recently used entries until the cache fits max_bytes.
+    keep (the entry just fetched for a waiting request) is never evicted.
+    """
+    if not locked:
+        with cache_lock(cache_dir / ".lock"):
+            return evict_artifact_cache(cache_dir, max_bytes, locked=True, keep=keep)
+
+    evicted = evict_lru(cache_dir, ARTIFACT_CACHE_ENTRY_FILE, max_bytes, keep=keep)
+    if evicted:
+        _bump(cache_dir, evictions=evicted)
+
+    return evicted
+
+
+def artifact_cache_stats(cache_dir: Path = ARTIFACT_CACHE_DIR, max_bytes: int = None) -> dict:
+    """
+    max_bytes defaults to the budget cache_dir was last filled with.
+    """
+    if not cache_dir.exists():
+        stats = dict(_EMPTY_STATS)
+        entries = []
+    else:
+        with cache_lock(cache_dir / ".lock"):
+            stats = read_json(cache_dir / ARTIFACT_CACHE_STATS_FILE, dict(_EMPTY_STATS))
+            entries = _entries(cache_dir)
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+        "entries": len(entries),
+        "size_bytes": sum(entry["size_bytes"] for _, entry in entries),
+        "max_bytes": max_bytes or stats.get("max_bytes", ARTIFACT_CACHE_MAX_BYTES)
+    }
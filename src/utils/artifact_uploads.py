@@ -0,0 +1,191 @@
+import json
+import time
+from pathlib import Path
+
+from src.constants import (
+    BASE_UPLOAD_DIR,
+    JOB_REGISTRY_DB,
+    STATUS_PENDING,
+    STATUS_RUNNING,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    S3_ASYNC_UPLOAD_MAX_ATTEMPTS,
+    S3_ASYNC_UPLOAD_RETRY_SECONDS,
+    S3_ASYNC_UPLOAD_RETRY_MAX_SECONDS
+)
+from src.utils.sqlite_db import connect
+from src.utils.s3_utils import upload_files_to_s3, S3UploadError
+from src.utils.job_status import write_progress
+
+# Lives in the job registry database next to the jobs it belongs to
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifact_uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    version TEXT,
+    files TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    results TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    retry_at REAL
+);
+CREATE INDEX IF NOT EXISTS artifact_uploads_state ON artifact_uploads (state, id);
+CREATE INDEX IF NOT EXISTS artifact_uploads_job ON artifact_uploads (job_id, id);
+"""
+
+_MIGRATIONS = (
+    "ALTER TABLE artifact_uploads ADD COLUMN retry_at REAL",
+)
+
+
+def _connect(db_path: Path = JOB_REGISTRY_DB):
+    return connect(db_path, _SCHEMA, _MIGRATIONS)
+
+
+def _upload(row) -> dict:
+    if row is None:
+        return None
+    entry = dict(row)
+    entry["files"] = json.loads(entry["files"])
+    entry["results"] = json.loads(entry["results"]) if entry["results"] else None
+    return entry
+
+
+def enqueue_artifact_upload(
+    job_id: str,
+    version: str,
+    files: list,
+    db_path: Path = JOB_REGISTRY_DB
+) -> int:
+    """
+    Records a batch of (local_path, s3_key) uploads for the training worker.
+    """
+    with _connect(db_path) as conn:
+        cursor = conn.execute(
+            "INSERT INTO artifact_uploads (job_id, version, files, state, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job_id, version, json.dumps([[str(path), key] for path, key in files]),
+             STATUS_PENDING, time.time())
+        )
+        return cursor.lastrowid
+
+
+def claim_artifact_uploads(limit: int, db_path: Path = JOB_REGISTRY_DB) -> list:
+    """
+    Pending batches, oldest first, skipping retries not yet due.
+    """
+    if limit <= 0:
+        return []
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT * FROM artifact_uploads WHERE state = ? "
+            "AND (retry_at IS NULL OR retry_at <= ?) ORDER BY id LIMIT ?",
+            (STATUS_PENDING, time.time(), limit)
+        ).fetchall()
+        for row in rows:
+            conn.execute(
+                "UPDATE artifact_uploads SET state = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (STATUS_RUNNING, time.time(), row["id"])
+            )
+        conn.execute("COMMIT")
+
+    entries = [_upload(row) for row in rows]
+    for entry in entries:
+        entry["attempts"] += 1
+    return entries
+
+
+def finish_artifact_upload(
+    upload_id: int,
+    state: str,
+    results: list = None,
+    error: str = None,
+    db_path: Path = JOB_REGISTRY_DB
+):
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE artifact_uploads SET state = ?, results = ?, error = ?, finished_at = ? "
+            "WHERE id = ?",
+            (state, json.dumps(results) if results is not None else None, error,
+             time.time(), upload_id)
+        )
+
+
+def retry_artifact_upload(
+    upload_id: int,
+    attempts: int,
+    results: list = None,
+    error: str = None,
+    db_path: Path = JOB_REGISTRY_DB
+):
+    """
+    Puts a failed batch back in the queue, due after a delay that doubles
+    with each attempt.
+    """
+    delay = min(
+        S3_ASYNC_UPLOAD_RETRY_SECONDS * 2 ** (attempts - 1),
+        S3_ASYNC_UPLOAD_RETRY_MAX_SECONDS
+    )
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE artifact_uploads SET state = ?, results = ?, error = ?, retry_at = ? "
+            "WHERE id = ?",
+            (STATUS_PENDING, json.dumps(results) if results is not None else None, error,
+             time.time() + delay, upload_id)
+        )
+
+
+def recover_artifact_uploads(db_path: Path = JOB_REGISTRY_DB) -> int:
+    """
+    Uploads interrupted by a worker restart are retried from the start
+    (S3 PUTs are idempotent per key).
+    """
+    with _connect(db_path) as conn:
+        cursor = conn.execute(
+            "UPDATE artifact_uploads SET state = ? WHERE state = ?",
+            (STATUS_PENDING, STATUS_RUNNING)
+        )
+        return cursor.rowcount
+
+
+def get_artifact_uploads(job_id: str, db_path: Path = JOB_REGISTRY_DB) -> list:
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM artifact_uploads WHERE job_id = ? ORDER BY id", (job_id,)
+        ).fetchall()
+    return [_upload(row) for row in rows]
+
+
+def run_artifact_upload(entry: dict, db_path: Path = JOB_REGISTRY_DB) -> str:
+    """
+    Uploads one claimed batch and records the outcome on the upload and,
+    as a progress event, on the job. A failed batch is retried later
+    (S3_ASYNC_UPLOAD_MAX_ATTEMPTS in all) before it is given up.
+    """
+    job_dir = BASE_UPLOAD_DIR / entry["job_id"]
+    try:
+        results = upload_files_to_s3([(Path(path), key) for path, key in entry["files"]])
+    except Exception as e:
+        failed = e.failed if isinstance(e, S3UploadError) else None
+        if entry["attempts"] < S3_ASYNC_UPLOAD_MAX_ATTEMPTS:
+            retry_artifact_upload(entry["id"], entry["attempts"], failed, str(e), db_path)
+            write_progress(job_dir, message=f"Artifact upload failed, will retry: {e}")
+            return STATUS_PENDING
+        finish_artifact_upload(entry["id"], STATUS_FAILED, failed, str(e), db_path)
+        write_progress(job_dir, message=f"Artifact upload failed: {e}")
+        return STATUS_FAILED
+
+    finish_artifact_upload(entry["id"], STATUS_COMPLETED, results, db_path=db_path)
+    write_progress(
+        job_dir,
+        stage="artifacts_uploaded",
+        message=f"Artifacts for {entry['version']} uploaded to S3",
+        data={"uploaded": results}
+    )
+    return STATUS_COMPLETED
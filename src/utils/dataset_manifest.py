@@ -0,0 +1,122 @@
+import os
+import json
+from pathlib import Path, PurePosixPath
+from datetime import datetime
+
+from src.constants import (
+    IMAGE_EXTENSIONS,
+    ANNOTATION_EXTENSION,
+    ANNOTATION_STORE_FILE,
+    DATASET_MANIFEST_FILE,
+    TRANSFORM_WORKERS
+)
+from src.utils.annotation_scan import scan_annotations
+from src.utils.annotation_store import AnnotationStore
+
+
+def build_dataset_manifest(
+    source,
+    job_dir: Path,
+    store: AnnotationStore = None,
+    files: list = None,
+    workers: int = TRANSFORM_WORKERS
+) -> dict:
+    """
+    Walks the dataset once and records what every later stage needs:
+    images, annotations, image/XML pairs, orphans, sizes and the class
+    labels found in the XMLs.
+
+    The XMLs are parsed once here into the annotation store, which
+    transformation and metadata reuse. Pass an existing store (and file
+    listing) to skip parsing and walking, e.g. after an incremental append.
+    """
+    if files is None:
+        files = source.files()
+
+    images = [n for n in files if PurePosixPath(n).suffix.lower() in IMAGE_EXTENSIONS]
+    annotations = [n for n in files if PurePosixPath(n).suffix.lower() == ANNOTATION_EXTENSION]
+
+    annotation_set = set(annotations)
+    pairs = {}
+    for image in images:
+        xml_name = str(PurePosixPath(image).with_suffix(ANNOTATION_EXTENSION))
+        if xml_name in annotation_set:
+            pairs[image] = xml_name
+
+    paired = set(pairs.values())
+
+    if store is None:
+        store = AnnotationStore.from_records(images, scan_annotations(source, images, workers))
+        store.save(job_dir / ANNOTATION_STORE_FILE)
+
+    sizes = {name: source.size(name) for name in images + annotations}
+
+    manifest = {
+        "created_at_utc": datetime.utcnow().isoformat(),
+        "source": type(source).__name__,
+        "num_images": len(images),
+        "num_annotations": len(annotations),
+        "total_bytes": sum(sizes.values()),
+        "images": images,
+        "annotations": annotations,
+        "pairs": pairs,
+        "orphan_images": [n for n in images if n not in pairs],
+        "orphan_annotations": [n for n in annotations if n not in paired],
+        "classes": store.label_counts(),
+        "sizes": sizes
+    }
+
+    manifest_path = job_dir / DATASET_MANIFEST_FILE
+    tmp_path = manifest_path.with_name(f".{manifest_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    return manifest
+
+
+def load_dataset_manifest(job_dir: Path):
+    manifest_path = job_dir / DATASET_MANIFEST_FILE
+    if not manifest_path.exists() or not (job_dir / ANNOTATION_STORE_FILE).exists():
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def get_dataset_manifest(source, job_dir: Path) -> dict:
+    return load_dataset_manifest(job_dir) or build_dataset_manifest(source, job_dir)
+
+
+def processed_name(image_name: str) -> str:
+    """
+    File name of an image in processed/images/<split>/: the relative path
+    joined with "__", so same-named images in different folders stay apart.
+    Its label is processed/labels/<split>/<stem>.txt.
+    """
+    return "__".join(PurePosixPath(image_name).parts)
+
+
+def find_name_collisions(images: list) -> dict:
+    """
+    Processed label stems claimed by more than one image, e.g. a/x.jpg and
+    a__x.jpg, or x.jpg and x.png. Such datasets cannot be written without
+    one image overwriting another.
+    """
+    claims = {}
+    for name in images:
+        claims.setdefault(PurePosixPath(processed_name(name)).stem, []).append(name)
+    return {stem: names for stem, names in claims.items() if len(names) > 1}
+
+
+def manifest_files(manifest: dict) -> list:
+    """
+    Images and annotations, i.e. the files that define dataset content.
+    """
+    return manifest["images"] + manifest["annotations"]
+
+
+def class_map_from_manifest(manifest: dict) -> dict:
+    """
+    Class ids follow the sorted label names found in the data.
+    """
+    return {label: idx for idx, label in enumerate(sorted(manifest["classes"]))}
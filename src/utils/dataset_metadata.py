@@ -1,60 +1,118 @@
 import json
-import hashlib
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from datetime import datetime
-from collections import defaultdict
+import numpy as np
 
-from src.constants import DATASET_METADATA_FILE, IMAGE_EXTENSIONS, ANNOTATION_EXTENSION
+from src.constants import DATASET_METADATA_FILE, ANNOTATION_STORE_FILE, IMAGE_EXTENSIONS
+from src.utils.dataset_source import DirectorySource
+from src.utils.annotation_scan import scan_annotations
+from src.utils.annotation_store import AnnotationStore
+from src.utils.fingerprint import compute_data_fingerprint, FINGERPRINT_ALGORITHM
+from src.utils.dataset_manifest import load_dataset_manifest, manifest_files
 
 
-def compute_data_fingerprint(images: list[Path]) -> str:
+def _stats(values: np.ndarray) -> dict:
+    return {
+        "min": round(float(values.min()), 6),
+        "max": round(float(values.max()), 6),
+        "mean": round(float(values.mean()), 6)
+    }
+
+
+def summarize_annotations(store: AnnotationStore, class_map: dict = None) -> dict:
     """
-    Lightweight dataset fingerprint based on filenames + sizes.
+    Class, box-size and resolution statistics, computed on the same
+    clipped boxes that yolo_labels() writes, so they match the label files.
+    Without a class_map every label in the store is counted.
     """
-    sha = hashlib.sha256()
-    for img in sorted(images, key=lambda x: x.name):
-        sha.update(img.name.encode())
-        sha.update(str(img.stat().st_size).encode())
-    return sha.hexdigest()
-
-
-def generate_dataset_metadata(job_dir: Path, extracted_dir: Path):
-    images = [p for p in extracted_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
-    xmls = [p for p in extracted_dir.iterdir() if p.suffix.lower() == ANNOTATION_EXTENSION]
-
-    class_counts = defaultdict(int)
-    total_boxes = 0
-
-    for xml in xmls:
-        text = xml.read_text(errors="ignore")
-        for line in text.splitlines():
-            if "<name>" in line:
-                label = line.replace("<name>", "").replace("</name>", "").strip()
-                class_counts[label] += 1
-                total_boxes += 1
-
-    resolutions = []
-    for xml in xmls:
-        text = xml.read_text(errors="ignore")
-        if "<width>" in text and "<height>" in text:
-            try:
-                w = int(text.split("<width>")[1].split("</width>")[0])
-                h = int(text.split("<height>")[1].split("</height>")[0])
-                resolutions.append((w, h))
-            except Exception:
-                pass
+    if class_map is None:
+        class_map = {label: i for i, label in enumerate(sorted(store.labels.tolist()))}
+
+    class_ids, yolo, box_image = store.yolo_boxes(class_map)
+    img_w = store.widths[box_image]
+    img_h = store.heights[box_image]
+
+    widths_px = np.rint(yolo[:, 2] * img_w)
+    heights_px = np.rint(yolo[:, 3] * img_h)
+    areas = yolo[:, 2] * yolo[:, 3]
+
+    classes = {}
+    box_stats = {}
+    for label, class_id in class_map.items():
+        mask = class_ids == class_id
+        count = int(mask.sum())
+        if count == 0:
+            continue
+
+        classes[label] = count
+        box_stats[label] = {
+            "count": count,
+            "width_px": _stats(widths_px[mask]),
+            "height_px": _stats(heights_px[mask]),
+            "relative_area": _stats(areas[mask])
+        }
+
+    labeled = store.has_xml & (store.num_objects > 0)
+    sizes = np.stack([store.widths[labeled], store.heights[labeled]], axis=1)
+    resolutions, counts = np.unique(sizes, axis=0, return_counts=True)
+
+    return {
+        "num_labeled_images": int(labeled.sum()),
+        "num_annotations": int(len(class_ids)),
+        "classes": classes,
+        "box_stats": box_stats,
+        "image_resolution_summary": {
+            "min": resolutions[0].tolist() if len(resolutions) else None,
+            "max": resolutions[-1].tolist() if len(resolutions) else None,
+            "distribution": {
+                f"{w}x{h}": count
+                for (w, h), count in zip(resolutions.tolist(), counts.tolist())
+            }
+        }
+    }
+
+
+def generate_dataset_metadata(
+    job_dir: Path,
+    source,
+    images: list = None,
+    store: AnnotationStore = None,
+    class_map: dict = None,
+    extra: dict = None
+):
+    """
+    Writes dataset_metadata.json and the columnar annotation store.
+
+    transform_dataset passes the store it built its label files from, so
+    XMLs are not read again and the statistics match the labels exactly.
+    Without a store the XMLs are scanned once here.
+    """
+    if isinstance(source, Path):
+        source = DirectorySource(source)
+
+    if images is None:
+        images = [
+            p for p in source.files()
+            if PurePosixPath(p).suffix.lower() in IMAGE_EXTENSIONS
+        ]
+
+    if store is None:
+        store = AnnotationStore.from_records(images, scan_annotations(source, images))
+        store.save(job_dir / ANNOTATION_STORE_FILE)
+
+    summary = summarize_annotations(store, class_map)
+
+    manifest = load_dataset_manifest(job_dir)
+    fingerprint_names = manifest_files(manifest) if manifest else None
 
     metadata = {
         "job_id": job_dir.name,
         "created_at_utc": datetime.utcnow().isoformat(),
         "num_images": len(images),
-        "num_annotations": total_boxes,
-        "classes": dict(class_counts),
-        "image_resolution_summary": {
-            "min": list(min(resolutions)) if resolutions else None,
-            "max": list(max(resolutions)) if resolutions else None,
-        },
-        "data_fingerprint": compute_data_fingerprint(images),
+        **summary,
+        "data_fingerprint": compute_data_fingerprint(source, job_dir, names=fingerprint_names)["fingerprint"],
+        "fingerprint_algorithm": FINGERPRINT_ALGORITHM,
+        **(extra or {}),
     }
 
     metadata_path = job_dir / DATASET_METADATA_FILE
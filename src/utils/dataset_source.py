@@ -0,0 +1,178 @@
+import shutil
+import zipfile
+import threading
+from pathlib import Path
+
+from src.constants import RAW_ZIP_DIR, EXTRACTED_DIR, DELTA_ZIP_PREFIX
+from src.utils.zip_extractor import check_archive
+from src.utils.file_materializer import materialize
+
+
+class DirectorySource:
+    """
+    Dataset files read from an extracted directory.
+    Member names are POSIX paths relative to the root.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def files(self):
+        return sorted(
+            p.relative_to(self.root).as_posix()
+            for p in self.root.rglob("*")
+            if p.is_file()
+        )
+
+    def open(self, name: str):
+        return open(self.root / name, "rb")
+
+    def size(self, name: str) -> int:
+        return (self.root / name).stat().st_size
+
+    def exists(self, name: str) -> bool:
+        return (self.root / name).is_file()
+
+    def stamp(self, name: str) -> list:
+        """
+        Cheap change marker used to skip rehashing unchanged files.
+        """
+        st = (self.root / name).stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    def local_path(self, name: str):
+        return self.root / name
+
+    def copy_to(self, name: str, dest: Path) -> str:
+        return materialize(self.root / name, dest)
+
+
+class ZipSource:
+    """
+    Dataset files read straight from the uploaded archive(s), no extracted/
+    copy. With several archives (base upload + appended deltas) a member in
+    a later archive overrides the same name in an earlier one.
+
+    Each thread gets its own ZipFile handles; handles are dropped on
+    pickling so the source can be shipped to worker processes.
+    """
+
+    def __init__(self, zip_paths):
+        if isinstance(zip_paths, (str, Path)):
+            zip_paths = [zip_paths]
+        self.zip_paths = [Path(p) for p in zip_paths]
+        self._members = None
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"zip_paths": self.zip_paths}
+
+    def __setstate__(self, state):
+        self.__init__(state["zip_paths"])
+
+    def _zip(self, idx: int = 0) -> zipfile.ZipFile:
+        handles = getattr(self._local, "handles", None)
+        if handles is None:
+            handles = self._local.handles = {}
+        if idx not in handles:
+            handles[idx] = zipfile.ZipFile(self.zip_paths[idx], "r")
+        return handles[idx]
+
+    @property
+    def members(self):
+        """
+        name -> (archive index, ZipInfo)
+        """
+        if self._members is None:
+            members = {}
+            for idx in range(len(self.zip_paths)):
+                for info, parts in check_archive(self._zip(idx)):
+                    if not info.is_dir():
+                        members["/".join(parts)] = (idx, info)
+            self._members = members
+        return self._members
+
+    def files(self):
+        return sorted(self.members)
+
+    def open(self, name: str):
+        idx, info = self.members[name]
+        return self._zip(idx).open(info)
+
+    def size(self, name: str) -> int:
+        return self.members[name][1].file_size
+
+    def exists(self, name: str) -> bool:
+        return name in self.members
+
+    def stamp(self, name: str) -> list:
+        info = self.members[name][1]
+        return [info.file_size, info.CRC]
+
+    def local_path(self, name: str):
+        return None
+
+    def copy_to(self, name: str, dest: Path) -> str:
+        Path(dest).unlink(missing_ok=True)
+        with self.open(name) as src, open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        return "stream"
+
+
+class OverlaySource:
+    """
+    A delta source laid over a base source: names in the delta override
+    the same names in the base. Used to read a staged delta together with
+    the job's current files before the delta is committed.
+    """
+
+    def __init__(self, base, delta):
+        self.base = base
+        self.delta = delta
+
+    def _owner(self, name: str):
+        return self.delta if self.delta.exists(name) else self.base
+
+    def files(self):
+        return sorted(set(self.base.files()) | set(self.delta.files()))
+
+    def open(self, name: str):
+        return self._owner(name).open(name)
+
+    def size(self, name: str) -> int:
+        return self._owner(name).size(name)
+
+    def exists(self, name: str) -> bool:
+        return self.delta.exists(name) or self.base.exists(name)
+
+    def stamp(self, name: str) -> list:
+        return self._owner(name).stamp(name)
+
+    def local_path(self, name: str):
+        return self._owner(name).local_path(name)
+
+    def copy_to(self, name: str, dest: Path) -> str:
+        return self._owner(name).copy_to(name, dest)
+
+
+def find_raw_zips(job_dir: Path) -> list:
+    """
+    Base archive first, then appended deltas in the order they arrived.
+    """
+    zips = sorted(
+        (job_dir / RAW_ZIP_DIR).glob("*.zip"),
+        key=lambda p: (p.name.startswith(DELTA_ZIP_PREFIX), p.name)
+    )
+    if not zips:
+        raise FileNotFoundError(f"No uploaded archive found for {job_dir.name}")
+    return zips
+
+
+def open_dataset_source(job_dir: Path):
+    """
+    Uses extracted/ when the upload was extracted, otherwise reads the raw ZIP(s).
+    """
+    extracted_dir = job_dir / EXTRACTED_DIR
+    if extracted_dir.exists():
+        return DirectorySource(extracted_dir)
+    return ZipSource(find_raw_zips(job_dir))
@@ -0,0 +1,102 @@
+import os
+import json
+import fcntl
+import shutil
+from pathlib import Path
+from contextlib import contextmanager
+
+
+# Helpers shared by the on-disk LRU caches (processed datasets, artifacts):
+# one directory per entry holding an entry file with "size_bytes" and
+# "last_used", a stats file of counters and a .lock next to them.
+
+
+@contextmanager
+def cache_lock(lock_path: Path, remove: bool = False):
+    """
+    Cross-process flock on lock_path: several uvicorn workers and the
+    training worker share the cache directories.
+
+    With remove, the lock file is deleted before it is released; waiters
+    then find it replaced and lock the new file instead.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        lock = open(lock_path, "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.stat(lock_path).st_ino == os.fstat(lock.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        lock.close()
+
+    try:
+        yield
+    finally:
+        if remove:
+            lock_path.unlink(missing_ok=True)
+        lock.close()
+
+
+def read_json(path: Path, default):
+    if not path.exists():
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data):
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def bump_stats(stats_path: Path, empty: dict, max_bytes: int = None, **counters):
+    """
+    Adds to the counters in stats_path. max_bytes records the budget the
+    cache is filled with, for the stats endpoints.
+    """
+    stats = read_json(stats_path, dict(empty))
+    for counter, n in counters.items():
+        stats[counter] = stats.get(counter, 0) + n
+    if max_bytes is not None:
+        stats["max_bytes"] = max_bytes
+    write_json(stats_path, stats)
+
+
+def list_entries(cache_dir: Path, entry_file: str) -> list:
+    """
+    (entry dir, entry) for every published entry.
+    """
+    entries = []
+    for entry_dir in cache_dir.iterdir():
+        # skips locks, stats and in-flight .staging_* dirs
+        if entry_dir.name.startswith(".") or not entry_dir.is_dir():
+            continue
+        entry = read_json(entry_dir / entry_file, None)
+        if entry is not None:
+            entries.append((entry_dir, entry))
+    return entries
+
+
+def evict_lru(cache_dir: Path, entry_file: str, max_bytes: int, keep: Path = None) -> int:
+    """
+    Removes least recently used entries until the cache fits max_bytes.
+    keep is never evicted. The caller holds the cache lock.
+    """
+    entries = sorted(list_entries(cache_dir, entry_file), key=lambda e: e[1]["last_used"])
+    total = sum(entry["size_bytes"] for _, entry in entries)
+
+    evicted = 0
+    for entry_dir, entry in entries:
+        if total <= max_bytes:
+            break
+        if entry_dir == keep:
+            continue
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= entry["size_bytes"]
+        evicted += 1
+
+    return evicted
@@ -0,0 +1,80 @@
+import json
+import asyncio
+
+from src.constants import (
+    EVENT_POLL_SECONDS,
+    EVENT_QUEUE_SIZE,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_CANCELLED
+)
+from src.utils.job_registry import get_events_after, last_event_id
+from src.utils.job_status import json_safe
+
+FINAL_STATES = {STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED}
+
+
+class JobEventBroker:
+    """
+    In-process fan-out of job events to streaming clients.
+
+    Trainings run in worker processes and publish to the job registry;
+    the broker tails the registry with one query per poll for all watched
+    jobs, however many clients are watching, and hands each new event to
+    every subscriber's queue.
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = EVENT_POLL_SECONDS,
+        queue_size: int = EVENT_QUEUE_SIZE
+    ):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.subscribers = {}   # job_id -> set of asyncio.Queue
+        self.last_id = None
+        self._task = None
+
+    async def subscribe(self, job_id: str) -> asyncio.Queue:
+        if self.last_id is None:
+            self.last_id = await asyncio.to_thread(last_event_id)
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(job_id, set()).add(queue)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(job_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[job_id]
+
+    def _publish(self, event: dict):
+        for queue in self.subscribers.get(event["job_id"], ()):
+            if queue.full():
+                # A stalled client loses its oldest events, not the newest
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self):
+        while self.subscribers:
+            events = await asyncio.to_thread(
+                get_events_after, self.last_id, list(self.subscribers)
+            )
+            for event in events:
+                self.last_id = max(self.last_id, event["id"])
+                self._publish(event)
+
+            if not events:
+                await asyncio.sleep(self.poll_seconds)
+
+
+def format_sse(event: dict) -> str:
+    # Events recorded before write_progress sanitized them may hold NaN
+    data = json.dumps(json_safe(event), allow_nan=False)
+    return f"id: {event['id']}\nevent: progress\ndata: {data}\n\n"
@@ -0,0 +1,96 @@
+import os
+import uuid
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX hosts fall back to hardlink/copy
+    fcntl = None
+
+from src.constants import MATERIALIZE_METHODS
+
+
+# Linux FICLONE ioctl (btrfs, xfs with reflink=1, ...)
+FICLONE = 0x40049409
+
+# (src device, dest device) -> methods that already failed there,
+# so we do not retry a failing syscall for every file
+_unsupported = {}
+
+
+def _reflink(src: Path, dest: Path):
+    if fcntl is None:
+        raise OSError("reflink not supported on this platform")
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def _hardlink(src: Path, dest: Path):
+    os.link(src, dest)
+
+
+def _copy(src: Path, dest: Path):
+    shutil.copy(src, dest)
+
+
+_METHODS = {
+    "reflink": _reflink,
+    "hardlink": _hardlink,
+    "copy": _copy,
+}
+
+
+def materialize(src: Path, dest: Path, allow_hardlink: bool = True) -> str:
+    """
+    Places an immutable file at dest as cheaply as the filesystem allows:
+    reflink, then hardlink, then a real copy.
+
+    dest is replaced atomically, so an existing dest that is a hardlink of
+    another file is never written through. Pass allow_hardlink=False when
+    src may later be rewritten in place (e.g. ultralytics' weights/best.pt).
+
+    Returns the method used.
+    """
+    src = Path(src)
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    key = (os.stat(src).st_dev, os.stat(dest.parent).st_dev)
+    failed = _unsupported.setdefault(key, set())
+
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+    for method in MATERIALIZE_METHODS:
+        if method in failed:
+            continue
+        if method == "hardlink" and not allow_hardlink:
+            continue
+
+        try:
+            _METHODS[method](src, tmp)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            if method != "copy":
+                failed.add(method)
+                continue
+            raise
+
+        os.replace(tmp, dest)
+        return method
+
+    raise OSError(f"Could not materialize {src} at {dest}")
+
+
+def materialize_tree(src_dir: Path, dest_dir: Path, skip=()) -> int:
+    """
+    Materializes every file under src_dir at the same relative path under
+    dest_dir. Returns the total logical size in bytes.
+    """
+    total = 0
+    for path in Path(src_dir).rglob("*"):
+        if not path.is_file() or path.name in skip:
+            continue
+        materialize(path, Path(dest_dir) / path.relative_to(src_dir))
+        total += path.stat().st_size
+    return total
@@ -0,0 +1,142 @@
+import os
+import json
+import hashlib
+from pathlib import Path, PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+
+from src.constants import (
+    IMAGE_EXTENSIONS,
+    ANNOTATION_EXTENSION,
+    FINGERPRINT_MANIFEST_FILE,
+    FINGERPRINT_WORKERS,
+    FINGERPRINT_READ_SIZE
+)
+
+FINGERPRINT_ALGORITHM = "sha256-merkle-v1"
+
+
+def hash_file(source, name: str) -> str:
+    """
+    SHA-256 of one dataset file, read in large chunks into a reused buffer.
+    hashlib releases the GIL on big updates, so threads hash in parallel.
+    """
+    sha = hashlib.sha256()
+    buf = bytearray(FINGERPRINT_READ_SIZE)
+    view = memoryview(buf)
+
+    with source.open(name) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            sha.update(view[:n])
+
+    return sha.hexdigest()
+
+
+def merkle_root(leaves: list) -> str:
+    """
+    Binary Merkle root over (name, digest) leaves sorted by name.
+    An odd node at any level is carried up unchanged.
+    """
+    level = [
+        hashlib.sha256(name.encode() + b"\0" + bytes.fromhex(digest)).digest()
+        for name, digest in sorted(leaves)
+    ]
+
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+
+    while len(level) > 1:
+        nxt = [
+            hashlib.sha256(level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+
+    return level[0].hex()
+
+
+def dataset_files(source) -> list:
+    """
+    Images and annotations that define the dataset's content.
+    """
+    return [
+        name for name in source.files()
+        if PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS
+        or PurePosixPath(name).suffix.lower() == ANNOTATION_EXTENSION
+    ]
+
+
+def load_manifest(job_dir: Path) -> dict:
+    manifest_path = job_dir / FINGERPRINT_MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("algorithm") != FINGERPRINT_ALGORITHM:
+        return {}
+    return manifest
+
+
+def compute_data_fingerprint(
+    source,
+    job_dir: Path,
+    names: list = None,
+    workers: int = FINGERPRINT_WORKERS
+) -> dict:
+    """
+    Content fingerprint of the dataset: a Merkle root over per-file SHA-256
+    digests of every image and XML.
+
+    Per-file digests are persisted in the job's fingerprint manifest; files
+    whose stamp (size + mtime, or size + CRC inside a ZIP) is unchanged
+    reuse their previous digest instead of being read again.
+
+    Returns:
+        {"fingerprint", "files", "rehashed"}
+    """
+    if names is None:
+        names = dataset_files(source)
+
+    previous = load_manifest(job_dir).get("files", {})
+
+    stamps = {name: source.stamp(name) for name in names}
+    digests = {}
+    to_hash = []
+
+    for name in names:
+        entry = previous.get(name)
+        if entry is not None and entry["stamp"] == stamps[name]:
+            digests[name] = entry["sha256"]
+        else:
+            to_hash.append(name)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, digest in zip(to_hash, pool.map(lambda n: hash_file(source, n), to_hash)):
+            digests[name] = digest
+
+    root = merkle_root(list(digests.items()))
+
+    manifest = {
+        "algorithm": FINGERPRINT_ALGORITHM,
+        "fingerprint": root,
+        "files": {
+            name: {"stamp": stamps[name], "sha256": digests[name]}
+            for name in sorted(names)
+        }
+    }
+
+    manifest_path = job_dir / FINGERPRINT_MANIFEST_FILE
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    return {
+        "fingerprint": root,
+        "files": len(names),
+        "rehashed": len(to_hash)
+    }
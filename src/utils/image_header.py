@@ -0,0 +1,117 @@
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) do not
+JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("JPEG ends before frame header")
+        if byte != b"\xff":
+            continue
+
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            raise ValueError("JPEG ends before frame header")
+
+        code = marker[0]
+        if code == 0xD8 or 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue  # standalone markers
+        if code in (0xD9, 0xDA):
+            raise ValueError("JPEG has no frame header before scan data")
+
+        segment = f.read(2)
+        if len(segment) < 2:
+            raise ValueError("JPEG ends inside a segment header")
+        length = struct.unpack(">H", segment)[0]
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length")
+
+        if code in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                raise ValueError("JPEG ends inside frame header")
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+
+        f.seek(length - 2, 1)
+
+
+def _png_size(f):
+    f.seek(8)
+    chunk = f.read(16)
+    if len(chunk) < 16 or chunk[4:8] != b"IHDR":
+        raise ValueError("PNG is missing its IHDR chunk")
+    return struct.unpack(">II", chunk[8:16])
+
+
+def read_image_header(f, size: int) -> dict:
+    """
+    Reads an image's format and dimensions from its header and checks its
+    end marker, without decoding pixel data.
+
+    f must be a seekable binary file object; size is its length in bytes.
+
+    Returns:
+        {"format", "width", "height", "truncated"}
+
+    Raises ValueError for files that are not a readable JPEG/PNG.
+    """
+    head = f.read(8)
+
+    if head.startswith(JPEG_SOI):
+        fmt = "jpeg"
+        width, height = _jpeg_size(f)
+    elif head == PNG_SIGNATURE:
+        fmt = "png"
+        width, height = _png_size(f)
+    else:
+        raise ValueError("Not a JPEG or PNG file")
+
+    if width == 0 or height == 0:
+        raise ValueError("Image header has zero width or height")
+
+    # Some encoders zero-pad JPEGs after EOI
+    window = min(size, 1024 if fmt == "jpeg" else len(PNG_IEND))
+    f.seek(size - window)
+    tail = f.read(window)
+
+    if fmt == "jpeg":
+        tail = tail.rstrip(b"\x00")
+        truncated = not tail.endswith(JPEG_EOI)
+    else:
+        truncated = not tail.endswith(PNG_IEND)
+
+    return {
+        "format": fmt,
+        "width": int(width),
+        "height": int(height),
+        "truncated": truncated
+    }
+
+
+def inspect_image(source, name: str) -> dict:
+    """
+    Header check for one dataset image. Never raises: problems are
+    reported in "error" so one bad file does not abort the whole scan.
+    """
+    try:
+        size = source.size(name)
+        with source.open(name) as f:
+            return {"image": name, "size_bytes": size, **read_image_header(f, size)}
+    except (OSError, ValueError, struct.error) as e:
+        return {"image": name, "error": str(e)}
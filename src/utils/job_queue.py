@@ -0,0 +1,251 @@
+import json
+import time
+from pathlib import Path
+
+from src.constants import (
+    TRAIN_QUEUE_DB,
+    TRAIN_QUEUE_MAX_ATTEMPTS,
+    TRAIN_DEFAULT_PRIORITY,
+    STATUS_PENDING,
+    STATUS_RUNNING,
+    STATUS_FAILED,
+    STATUS_CANCELLED
+)
+from src.utils.sqlite_db import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS train_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS train_queue_pick
+    ON train_queue (state, priority DESC, id);
+"""
+
+
+class JobAlreadyQueuedError(ValueError):
+    pass
+
+
+def _connect(db_path: Path = TRAIN_QUEUE_DB):
+    return connect(db_path, _SCHEMA)
+
+
+def _row(row) -> dict:
+    if row is None:
+        return None
+    entry = dict(row)
+    entry["params"] = json.loads(entry["params"])
+    entry["cancel_requested"] = bool(entry["cancel_requested"])
+    return entry
+
+
+def enqueue_training(
+    job_id: str,
+    params: dict,
+    priority: int = TRAIN_DEFAULT_PRIORITY,
+    db_path: Path = TRAIN_QUEUE_DB
+) -> dict:
+    """
+    Adds a training request. Higher priority runs first, FIFO within a
+    priority. A job can only be queued or running once at a time.
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            active = conn.execute(
+                "SELECT id FROM train_queue WHERE job_id = ? AND state IN (?, ?)",
+                (job_id, STATUS_PENDING, STATUS_RUNNING)
+            ).fetchone()
+            if active is not None:
+                raise JobAlreadyQueuedError(f"Job {job_id} is already queued or running")
+
+            cursor = conn.execute(
+                "INSERT INTO train_queue (job_id, params, priority, state, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, json.dumps(params), priority, STATUS_PENDING, time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return get_queue_entry(cursor.lastrowid, db_path)
+
+
+def peek_next(db_path: Path = TRAIN_QUEUE_DB):
+    """
+    The entry claim_next would pick, without claiming it.
+    """
+    with _connect(db_path) as conn:
+        return _row(conn.execute(
+            "SELECT * FROM train_queue WHERE state = ? "
+            "ORDER BY priority DESC, id LIMIT 1",
+            (STATUS_PENDING,)
+        ).fetchone())
+
+
+def claim_next(worker_pid: int, db_path: Path = TRAIN_QUEUE_DB, queue_id: int = None):
+    """
+    Atomically moves the next queued entry (or queue_id, if it is still
+    queued) to running. None if there is nothing to claim.
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if queue_id is None:
+            row = conn.execute(
+                "SELECT id FROM train_queue WHERE state = ? "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (STATUS_PENDING,)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT id FROM train_queue WHERE state = ? AND id = ?",
+                (STATUS_PENDING, queue_id)
+            ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        conn.execute(
+            "UPDATE train_queue SET state = ?, worker_pid = ?, started_at = ?, "
+            "attempts = attempts + 1 WHERE id = ?",
+            (STATUS_RUNNING, worker_pid, time.time(), row["id"])
+        )
+        conn.execute("COMMIT")
+
+    return get_queue_entry(row["id"], db_path)
+
+
+def finish_entry(queue_id: int, state: str, error: str = None, db_path: Path = TRAIN_QUEUE_DB):
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE train_queue SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+            (state, error, time.time(), queue_id)
+        )
+
+
+def cancel_training(job_id: str, db_path: Path = TRAIN_QUEUE_DB):
+    """
+    Queued entries are cancelled at once; running ones are flagged and
+    stopped by the worker. Returns the entry, or None if nothing is active.
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id, state FROM train_queue WHERE job_id = ? AND state IN (?, ?)",
+            (job_id, STATUS_PENDING, STATUS_RUNNING)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        if row["state"] == STATUS_PENDING:
+            conn.execute(
+                "UPDATE train_queue SET state = ?, cancel_requested = 1, finished_at = ? "
+                "WHERE id = ?",
+                (STATUS_CANCELLED, time.time(), row["id"])
+            )
+        else:
+            conn.execute(
+                "UPDATE train_queue SET cancel_requested = 1 WHERE id = ?",
+                (row["id"],)
+            )
+        conn.execute("COMMIT")
+
+    return get_queue_entry(row["id"], db_path)
+
+
+def cancel_requested_ids(db_path: Path = TRAIN_QUEUE_DB) -> set:
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT id FROM train_queue WHERE state = ? AND cancel_requested = 1",
+            (STATUS_RUNNING,)
+        ).fetchall()
+    return {row["id"] for row in rows}
+
+
+def recover_interrupted(
+    db_path: Path = TRAIN_QUEUE_DB,
+    max_attempts: int = TRAIN_QUEUE_MAX_ATTEMPTS,
+    clean_shutdown: bool = False
+) -> list:
+    """
+    Entries still marked running were interrupted. They go back to the
+    queue (keeping their place) unless cancelled or out of attempts.
+
+    The worker calls this on startup (after a crash or kill) and with
+    clean_shutdown when it stops trainings itself; those runs do not count
+    as attempts.
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT * FROM train_queue WHERE state = ?", (STATUS_RUNNING,)
+        ).fetchall()
+
+        recovered = []
+        for row in rows:
+            attempts = row["attempts"] - 1 if clean_shutdown else row["attempts"]
+            if row["cancel_requested"]:
+                state, error = STATUS_CANCELLED, None
+            elif attempts >= max_attempts:
+                state, error = STATUS_FAILED, "Interrupted too many times"
+            else:
+                state, error = STATUS_PENDING, None
+
+            finished_at = None if state == STATUS_PENDING else time.time()
+            conn.execute(
+                "UPDATE train_queue SET state = ?, error = ?, worker_pid = NULL, "
+                "attempts = ?, finished_at = ? WHERE id = ?",
+                (state, error, attempts, finished_at, row["id"])
+            )
+            recovered.append({"id": row["id"], "job_id": row["job_id"], "state": state})
+
+        conn.execute("COMMIT")
+
+    return recovered
+
+
+def get_queue_entry(queue_id: int, db_path: Path = TRAIN_QUEUE_DB):
+    with _connect(db_path) as conn:
+        return _row(conn.execute(
+            "SELECT * FROM train_queue WHERE id = ?", (queue_id,)
+        ).fetchone())
+
+
+def get_active_entry(job_id: str, db_path: Path = TRAIN_QUEUE_DB):
+    """
+    The job's pending or running queue entry, if any.
+    """
+    with _connect(db_path) as conn:
+        return _row(conn.execute(
+            "SELECT * FROM train_queue WHERE job_id = ? AND state IN (?, ?)",
+            (job_id, STATUS_PENDING, STATUS_RUNNING)
+        ).fetchone())
+
+
+def list_queue(state: str = None, db_path: Path = TRAIN_QUEUE_DB) -> list:
+    """
+    Entries in the order the worker would run them.
+    """
+    query = "SELECT * FROM train_queue"
+    args = ()
+    if state:
+        query += " WHERE state = ?"
+        args = (state,)
+    query += " ORDER BY CASE state WHEN ? THEN 0 WHEN ? THEN 1 ELSE 2 END, priority DESC, id"
+
+    with _connect(db_path) as conn:
+        rows = conn.execute(query, args + (STATUS_RUNNING, STATUS_PENDING)).fetchall()
+    return [_row(row) for row in rows]
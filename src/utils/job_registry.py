@@ -0,0 +1,251 @@
+import json
+import time
+from pathlib import Path
+from datetime import datetime, timezone
+
+from src.constants import (
+    JOB_REGISTRY_DB,
+    STATUS_FILE,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_CANCELLED
+)
+from src.utils.sqlite_db import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    stage TEXT,
+    message TEXT,
+    progress REAL,
+    epoch INTEGER,
+    total_epochs INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state_updated ON jobs (state, updated_at DESC);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT,
+    message TEXT,
+    progress REAL,
+    epoch INTEGER,
+    data TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);
+"""
+
+_MIGRATIONS = (
+    "ALTER TABLE job_events ADD COLUMN data TEXT",
+)
+
+_FIELDS = ("stage", "message", "progress", "epoch", "total_epochs")
+
+# Final states keep the progress the job reached
+_FINAL_STATES = {STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED}
+
+
+def _connect(db_path: Path = JOB_REGISTRY_DB):
+    return connect(db_path, _SCHEMA, _MIGRATIONS)
+
+
+def _iso(ts: float):
+    return datetime.utcfromtimestamp(ts).isoformat() if ts is not None else None
+
+
+def _job(row) -> dict:
+    if row is None:
+        return None
+    job = dict(row)
+    job["status"] = job.pop("state")
+    job["timestamp"] = _iso(job["updated_at"])
+    job["created_at"] = _iso(job["created_at"])
+    job["updated_at"] = _iso(job["updated_at"])
+    return job
+
+
+def record_job_state(
+    job_id: str,
+    state: str = None,
+    data: dict = None,
+    db_path: Path = JOB_REGISTRY_DB,
+    **fields
+) -> dict:
+    """
+    Atomically updates a job and appends a timestamped event. data is an
+    optional JSON payload stored with the event only (e.g. epoch metrics).
+
+    state=None keeps the current state (progress-only update). Fields that
+    are not passed keep their value, except that entering a new non-final
+    state resets progress.
+    """
+    unknown = set(fields) - set(_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+
+    now = time.time()
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+            if current is None:
+                job = {field: None for field in _FIELDS}
+                job.update(state=state, created_at=now)
+            else:
+                job = dict(current)
+                if state is not None and state != job["state"]:
+                    if state not in _FINAL_STATES:
+                        job.update(progress=None, epoch=None, total_epochs=None)
+                    job["state"] = state
+
+            if job["state"] is None:
+                raise ValueError(f"Job {job_id} has no state yet")
+
+            job.update(fields)
+            job["updated_at"] = now
+
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, state, stage, message, progress, "
+                "epoch, total_epochs, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job["state"], job["stage"], job["message"], job["progress"],
+                 job["epoch"], job["total_epochs"], job["created_at"], now)
+            )
+            conn.execute(
+                "INSERT INTO job_events (job_id, state, stage, message, progress, "
+                "epoch, data, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job["state"], job["stage"], job["message"], job["progress"],
+                 job["epoch"], json.dumps(data) if data is not None else None, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    job["job_id"] = job_id
+    return _job(job)
+
+
+def get_job(job_id: str, db_path: Path = JOB_REGISTRY_DB):
+    with _connect(db_path) as conn:
+        return _job(conn.execute(
+            "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone())
+
+
+def _event(row) -> dict:
+    event = dict(row)
+    event["status"] = event.pop("state")
+    event["data"] = json.loads(event["data"]) if event["data"] else None
+    event["created_at"] = _iso(event["created_at"])
+    return event
+
+
+def get_job_events(
+    job_id: str,
+    after_id: int = 0,
+    limit: int = 1000,
+    db_path: Path = JOB_REGISTRY_DB
+) -> list:
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM job_events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (job_id, after_id, limit)
+        ).fetchall()
+    return [_event(row) for row in rows]
+
+
+def get_events_after(
+    after_id: int,
+    job_ids,
+    limit: int = 1000,
+    db_path: Path = JOB_REGISTRY_DB
+) -> list:
+    """
+    New events of several jobs in one query, for fan-out to subscribers.
+    """
+    job_ids = list(job_ids)
+    if not job_ids:
+        return []
+    marks = ", ".join("?" * len(job_ids))
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM job_events WHERE id > ? AND job_id IN ({marks}) "
+            "ORDER BY id LIMIT ?",
+            (after_id, *job_ids, limit)
+        ).fetchall()
+    return [_event(row) for row in rows]
+
+
+def last_event_id(db_path: Path = JOB_REGISTRY_DB) -> int:
+    with _connect(db_path) as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM job_events").fetchone()[0]
+
+
+def list_jobs(
+    state: str = None,
+    limit: int = 50,
+    offset: int = 0,
+    db_path: Path = JOB_REGISTRY_DB
+) -> dict:
+    """
+    Most recently updated first; served from the (state, updated_at) index.
+    """
+    where, args = "", ()
+    if state:
+        where, args = " WHERE state = ?", (state,)
+
+    with _connect(db_path) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM jobs{where}", args).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM jobs{where} ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            args + (limit, offset)
+        ).fetchall()
+
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "jobs": [_job(row) for row in rows]
+    }
+
+
+def import_status_files(base_dir: Path, db_path: Path = JOB_REGISTRY_DB) -> int:
+    """
+    One-off backfill of jobs that only have a status.json from before the
+    registry existed. Jobs already in the registry are left alone.
+    """
+    imported = 0
+    with _connect(db_path) as conn:
+        known = {row[0] for row in conn.execute("SELECT job_id FROM jobs")}
+
+    for status_path in Path(base_dir).glob(f"*/{STATUS_FILE}"):
+        job_id = status_path.parent.name
+        if job_id in known:
+            continue
+        try:
+            with open(status_path) as f:
+                data = json.load(f)
+            ts = datetime.fromisoformat(data["timestamp"])
+            ts = ts.replace(tzinfo=timezone.utc).timestamp()
+        except (OSError, ValueError, KeyError):
+            continue
+
+        with _connect(db_path) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, state, message, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, data.get("status", "unknown"), data.get("message"), ts, ts)
+            )
+        imported += 1
+
+    return imported
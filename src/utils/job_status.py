@@ -1,21 +1,62 @@
+import os
 import json
+import math
 from pathlib import Path
-from datetime import datetime
 from src.constants import STATUS_FILE
+from src.utils.job_registry import record_job_state, get_job
 
 
-def write_status(job_dir: Path, status: str, message: str = ""):
+def write_status(job_dir: Path, status: str, message: str = "", **progress):
+    """
+    Records a state transition in the job registry (atomic, timestamped).
+
+    status.json is kept as a per-job mirror for tools that read the job
+    directory; it is replaced atomically, never written in place.
+    """
+    job = record_job_state(job_dir.name, status, message=message, **progress)
+
     status_path = job_dir / STATUS_FILE
     data = {
-        "status": status,
-        "message": message,
-        "timestamp": datetime.utcnow().isoformat()
+        "status": job["status"],
+        "message": job["message"],
+        "timestamp": job["timestamp"]
     }
-    with open(status_path, "w") as f:
+    tmp_path = status_path.with_name(f".{status_path.name}.tmp")
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp_path, status_path)
+
+    return job
+
+
+def json_safe(value):
+    """
+    NaN/Infinity (e.g. ultralytics metrics in early epochs) as None: they
+    are not valid JSON for the API and SSE clients.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def write_progress(job_dir: Path, data: dict = None, **progress):
+    """
+    Progress within the current state: stage, progress (0..1), epoch,
+    total_epochs, message. data (e.g. epoch metrics) goes with the event.
+    """
+    return record_job_state(job_dir.name, data=json_safe(data), **json_safe(progress))
 
 
 def read_status(job_dir: Path):
+    job = get_job(job_dir.name)
+    if job is not None:
+        return job
+
+    # Jobs from before the registry
     status_path = job_dir / STATUS_FILE
     if not status_path.exists():
         return {"status": "unknown"}
@@ -0,0 +1,95 @@
+import math
+import time
+import threading
+from collections import deque
+
+from src.constants import PREDICT_LATENCY_WINDOW, PREDICT_THROUGHPUT_WINDOW_SECONDS
+
+
+def percentile(sorted_values: list, q: float):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(len(sorted_values) * q / 100))
+    return sorted_values[rank - 1]
+
+
+class LatencyTracker:
+    """
+    Rolling latency window per key (e.g. one per served model). Keeps the
+    last `window` samples, so percentiles follow current behaviour rather
+    than the whole process lifetime. Thread-safe.
+    """
+
+    def __init__(self, window: int = PREDICT_LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}   # key -> deque of seconds
+        self._counts = {}    # key -> total observations
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        return {
+            key: {
+                "count": counts[key],
+                "window": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2)
+            }
+            for key, values in samples.items()
+        }
+
+
+class RateMeter:
+    """
+    Events per second per key over the last `window_seconds`, plus the
+    lifetime total. Thread-safe.
+    """
+
+    def __init__(self, window_seconds: float = PREDICT_THROUGHPUT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._events = {}   # key -> deque of (monotonic time, amount)
+        self._totals = {}   # key -> total amount
+        self._lock = threading.Lock()
+
+    def _expire(self, events: deque, now: float):
+        while events and events[0][0] < now - self.window_seconds:
+            events.popleft()
+
+    def add(self, key: str, amount: int = 1):
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                events = self._events[key] = deque()
+            events.append((now, amount))
+            self._expire(events, now)
+            self._totals[key] = self._totals.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            for events in self._events.values():
+                self._expire(events, now)
+            return {
+                key: {
+                    "total": self._totals[key],
+                    "per_second": round(sum(amount for _, amount in events) / self.window_seconds, 2)
+                }
+                for key, events in self._events.items()
+            }
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import threading
+from pathlib import Path
+
+from src.constants import (
+    MLFLOW_TRACKING_URI,
+    MLFLOW_EXPERIMENT_NAME,
+    MLFLOW_SPOOL_DIR,
+    MLFLOW_FLUSH_SECONDS,
+    MLFLOW_BATCH_SIZE,
+    MLFLOW_PARAMS_BATCH_SIZE,
+    MLFLOW_RETRY_MAX_SECONDS,
+    MLFLOW_CLOSE_TIMEOUT_SECONDS
+)
+
+# MLflow rejects keys like "metrics/mAP50(B)"
+_INVALID_KEY_CHARS = re.compile(r"[^\w\-./ ]")
+
+
+def _state_path(spool_path: Path) -> Path:
+    return spool_path.with_suffix(".state.json")
+
+
+def _read_state(spool_path: Path) -> dict:
+    state_path = _state_path(spool_path)
+    if not state_path.exists():
+        return {"run_id": None, "offset": 0}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def _write_state(spool_path: Path, state: dict):
+    state_path = _state_path(spool_path)
+    tmp = state_path.with_name(f".{state_path.name}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_path)
+
+
+def _lock_spool(spool_path: Path, blocking: bool = True):
+    """
+    Returns an open lock file while it is held, or None if another process
+    (the training that owns the spool, or a replay) is sending it.
+    """
+    lock = open(spool_path.with_suffix(".lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _read_records(spool_path: Path, offset: int) -> list:
+    """
+    Complete (newline-terminated) records after offset, with the offset
+    just past each one.
+    """
+    records = []
+    with open(spool_path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            records.append((json.loads(line), offset))
+    return records
+
+
+def _start_run(client, record: dict) -> str:
+    experiment = client.get_experiment_by_name(record["experiment"])
+    if experiment is not None:
+        experiment_id = experiment.experiment_id
+    else:
+        experiment_id = client.create_experiment(record["experiment"])
+    return client.create_run(
+        experiment_id, run_name=record["run_name"], tags=record["tags"]
+    ).info.run_id
+
+
+def drain_mlflow_spool(spool_path: Path) -> bool:
+    """
+    Sends the spooled records not yet acknowledged, in order: runs of
+    params/metrics records become log_batch calls, artifacts are logged one
+    by one. Progress is saved after every call, so a failure (e.g. the
+    tracking server is down) raises and the next drain resumes from there.
+
+    Returns True once the run has been ended; the spool is then removed.
+    """
+    from mlflow.tracking import MlflowClient
+    from mlflow.entities import Metric, Param
+
+    state = _read_state(spool_path)
+    records = _read_records(spool_path, state["offset"])
+    if not records:
+        return False
+
+    with open(spool_path) as f:
+        run = json.loads(f.readline())
+    client = MlflowClient(tracking_uri=run["tracking_uri"])
+
+    i = 0
+    while i < len(records):
+        record, _ = records[i]
+
+        if record["op"] == "run":
+            if state["run_id"] is None:
+                state["run_id"] = _start_run(client, record)
+            i += 1
+
+        elif record["op"] in ("params", "metrics"):
+            metrics, params = [], []
+            while i < len(records) and records[i][0]["op"] in ("params", "metrics"):
+                record = records[i][0]
+                if record["op"] == "params":
+                    new_metrics = []
+                    new_params = [Param(key, str(value)) for key, value in record["params"].items()]
+                else:
+                    new_params = []
+                    new_metrics = [
+                        Metric(key, value, record["timestamp"], record["step"])
+                        for key, value in record["metrics"].items()
+                    ]
+                full = (
+                    len(params) + len(new_params) > MLFLOW_PARAMS_BATCH_SIZE
+                    or len(metrics) + len(new_metrics) + len(params) + len(new_params) > MLFLOW_BATCH_SIZE
+                )
+                if full and (metrics or params):
+                    break
+                metrics += new_metrics
+                params += new_params
+                i += 1
+
+            # Only more than one call when a single record exceeds the limits
+            while metrics or params:
+                batch_params = params[:MLFLOW_PARAMS_BATCH_SIZE]
+                batch_metrics = metrics[:MLFLOW_BATCH_SIZE - len(batch_params)]
+                client.log_batch(state["run_id"], metrics=batch_metrics, params=batch_params)
+                params = params[len(batch_params):]
+                metrics = metrics[len(batch_metrics):]
+
+        elif record["op"] == "artifact":
+            client.log_artifact(state["run_id"], record["path"], record.get("artifact_path"))
+            i += 1
+
+        elif record["op"] == "end":
+            client.set_terminated(state["run_id"], record["status"])
+            i += 1
+
+        state["offset"] = records[i - 1][1]
+        state.pop("last_error", None)
+        _write_state(spool_path, state)
+
+        if record["op"] == "end":
+            spool_path.unlink(missing_ok=True)
+            _state_path(spool_path).unlink(missing_ok=True)
+            spool_path.with_suffix(".lock").unlink(missing_ok=True)
+            return True
+
+    return False
+
+
+def replay_mlflow_spools(spool_dir: Path = MLFLOW_SPOOL_DIR) -> int:
+    """
+    Sends what trainings could not deliver before they exited (tracking
+    server down or slow) and ends the runs of killed trainings. Spools
+    still owned by a running training are skipped. Returns the number of
+    runs completed.
+    """
+    if not spool_dir.exists():
+        return 0
+
+    completed = 0
+    for spool_path in sorted(spool_dir.glob("*.jsonl")):
+        lock = _lock_spool(spool_path, blocking=False)
+        if lock is None:
+            continue
+        try:
+            if not spool_path.exists():
+                # Sent and removed by its owner since the glob; the lock
+                # file is the one opening it just re-created
+                spool_path.with_suffix(".lock").unlink(missing_ok=True)
+                continue
+            if not drain_mlflow_spool(spool_path):
+                # Unlocked without an end record: its training was killed
+                with open(spool_path, "a") as f:
+                    f.write(json.dumps({"op": "end", "status": "KILLED"}) + "\n")
+                drain_mlflow_spool(spool_path)
+            completed += not spool_path.exists()
+        except Exception as e:
+            state = _read_state(spool_path)
+            state["last_error"] = str(e)
+            _write_state(spool_path, state)
+        finally:
+            lock.close()
+    return completed
+
+
+class MlflowRunLogger:
+    """
+    Asynchronous MLflow run for a training.
+
+    Calls only append a record to a local spool file; a background thread
+    sends the spool every MLFLOW_FLUSH_SECONDS, batching metrics and params
+    into log_batch calls, and keeps retrying with backoff while the
+    tracking server is unavailable. On close the thread gets
+    MLFLOW_CLOSE_TIMEOUT_SECONDS to finish; anything left on disk is
+    replayed later by the training worker (replay_mlflow_spools).
+    """
+
+    def __init__(
+        self,
+        run_name: str,
+        experiment: str = MLFLOW_EXPERIMENT_NAME,
+        tracking_uri: str = MLFLOW_TRACKING_URI,
+        tags: dict = None,
+        spool_dir: Path = MLFLOW_SPOOL_DIR,
+        flush_seconds: float = MLFLOW_FLUSH_SECONDS
+    ):
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        self.spool_path = spool_dir / f"{run_name}-{uuid.uuid4().hex[:8]}.jsonl"
+        self.flush_seconds = flush_seconds
+        self.last_error = None
+
+        # Held for the life of the run so a replay never sends it concurrently
+        self._lock = _lock_spool(self.spool_path)
+        self._spool = open(self.spool_path, "a")
+        self._spool_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._abandoned = False
+
+        self._append({
+            "op": "run",
+            "run_name": run_name,
+            "experiment": experiment,
+            "tracking_uri": tracking_uri,
+            "tags": tags or {}
+        })
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _append(self, record: dict):
+        with self._spool_lock:
+            self._spool.write(json.dumps(record) + "\n")
+            self._spool.flush()
+
+    def log_params(self, params: dict):
+        self._append({"op": "params", "params": params})
+
+    def log_metrics(self, metrics: dict, step: int = 0):
+        metrics = {
+            _INVALID_KEY_CHARS.sub("", key): float(value)
+            for key, value in metrics.items()
+        }
+        self._append({
+            "op": "metrics",
+            "metrics": metrics,
+            "step": step,
+            "timestamp": int(time.time() * 1000)
+        })
+
+    def log_artifact(self, local_path: Path, artifact_path: str = None):
+        """
+        local_path must stay unchanged until it is sent, possibly after
+        this process has exited.
+        """
+        self._append({
+            "op": "artifact",
+            "path": str(Path(local_path).resolve()),
+            "artifact_path": artifact_path
+        })
+
+    def _run(self):
+        backoff = self.flush_seconds
+        try:
+            while not self._abandoned:
+                closing = self._closing
+                try:
+                    if drain_mlflow_spool(self.spool_path):
+                        return
+                    backoff = self.flush_seconds
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    backoff = min(backoff * 2, MLFLOW_RETRY_MAX_SECONDS)
+
+                if closing and self.last_error is None:
+                    return
+                self._wake.wait(self.flush_seconds if self.last_error is None else backoff)
+                self._wake.clear()
+        finally:
+            if self._abandoned:
+                self._record_error()
+                self._lock.close()
+
+    def _record_error(self):
+        if self.last_error is not None and self.spool_path.exists():
+            state = _read_state(self.spool_path)
+            state["last_error"] = self.last_error
+            _write_state(self.spool_path, state)
+
+    def close(self, status: str = "FINISHED", timeout: float = MLFLOW_CLOSE_TIMEOUT_SECONDS):
+        """
+        Ends the run and waits up to timeout for the spool to be sent.
+        Returns True if everything was delivered.
+        """
+        self._append({"op": "end", "status": status})
+        self._closing = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._spool.close()
+
+        # A thread still busy stops after the call in flight and then
+        # unlocks the spool for replay (at the latest when the process exits)
+        self._abandoned = True
+        if self._thread.is_alive():
+            return False
+
+        self._record_error()
+        self._lock.close()
+        return not self.spool_path.exists()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close("FINISHED" if exc_type is None else "FAILED")
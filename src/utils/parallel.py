@@ -0,0 +1,22 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from src.constants import PARALLEL_MAP_CHUNK_SIZE
+
+
+def parallel_map(func, items: list, workers: int, chunk_size: int = PARALLEL_MAP_CHUNK_SIZE) -> list:
+    """
+    list(map(func, items)) in a process pool, for CPU-bound per-file work.
+    Results keep input order, so they do not depend on scheduling.
+
+    Runs inline with one worker or when items fit in a single chunk, where
+    starting the pool would cost more than it saves. func and its bound
+    arguments must be picklable (spawn context).
+    """
+    if workers <= 1 or len(items) <= chunk_size:
+        return [func(item) for item in items]
+
+    chunksize = max(1, min(chunk_size, len(items) // (workers * 4) or 1))
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return list(pool.map(func, items, chunksize=chunksize))
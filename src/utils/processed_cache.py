@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+
+from src.constants import (
+    PROCESSED_DIR,
+    DATASET_METADATA_FILE,
+    ANNOTATION_STORE_FILE,
+    TRAIN_SPLIT_RATIO,
+    RANDOM_SEED,
+    PROCESSED_CACHE_DIR,
+    PROCESSED_CACHE_MAX_BYTES,
+    PROCESSED_CACHE_ENTRY_FILE,
+    PROCESSED_CACHE_STATS_FILE
+)
+from src.utils.file_materializer import materialize, materialize_tree
+from src.utils.disk_cache import cache_lock, read_json, write_json, bump_stats, list_entries, evict_lru
+
+# Bump when the processed layout or label format changes
+CACHE_FORMAT_VERSION = 2
+
+# data.yaml holds the absolute dataset path, so it is regenerated per job
+_JOB_SPECIFIC = {"data.yaml"}
+
+
+def cache_key(fingerprint: str, class_map: dict) -> str:
+    """
+    Processed output is a pure function of the dataset content, the class
+    map and the split settings.
+    """
+    payload = json.dumps({
+        "format": CACHE_FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "class_map": list(class_map.items()),
+        "train_split_ratio": TRAIN_SPLIT_RATIO,
+        "random_seed": RANDOM_SEED
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+_EMPTY_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _bump(cache_dir: Path, **counters):
+    bump_stats(cache_dir / PROCESSED_CACHE_STATS_FILE, _EMPTY_STATS, **counters)
+
+
+def restore_cached_dataset(key: str, job_dir: Path, cache_dir: Path = PROCESSED_CACHE_DIR):
+    """
+    On a hit, links the cached processed/ tree and annotation store into
+    job_dir and returns the cached dataset metadata; returns None on a miss.
+    The caller regenerates data.yaml and writes the job's own metadata.
+    """
+    with cache_lock(cache_dir / ".lock"):
+        entry_dir = cache_dir / key
+        entry_path = entry_dir / PROCESSED_CACHE_ENTRY_FILE
+        entry = read_json(entry_path, None)
+
+        if entry is None:
+            _bump(cache_dir, misses=1)
+            return None
+
+        materialize_tree(entry_dir / PROCESSED_DIR, job_dir / PROCESSED_DIR)
+        materialize(entry_dir / ANNOTATION_STORE_FILE, job_dir / ANNOTATION_STORE_FILE)
+        metadata = read_json(entry_dir / DATASET_METADATA_FILE, {})
+
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        write_json(entry_path, entry)
+        _bump(cache_dir, hits=1)
+
+    return metadata
+
+
+def store_cached_dataset(
+    key: str,
+    job_dir: Path,
+    cache_dir: Path = PROCESSED_CACHE_DIR,
+    max_bytes: int = PROCESSED_CACHE_MAX_BYTES
+):
+    """
+    Links a freshly processed job into the cache and evicts least recently
+    used entries until the cache fits its disk budget.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    if (cache_dir / key / PROCESSED_CACHE_ENTRY_FILE).exists():
+        return
+
+    # Build outside the lock, publish with an atomic rename
+    staging = cache_dir / f".staging_{key}_{uuid.uuid4().hex[:8]}"
+    size = materialize_tree(job_dir / PROCESSED_DIR, staging / PROCESSED_DIR, skip=_JOB_SPECIFIC)
+    materialize(job_dir / ANNOTATION_STORE_FILE, staging / ANNOTATION_STORE_FILE)
+    # metadata is rewritten in place per job, so the cache keeps its own copy
+    shutil.copyfile(job_dir / DATASET_METADATA_FILE, staging / DATASET_METADATA_FILE)
+    size += sum(
+        (staging / name).stat().st_size
+        for name in (ANNOTATION_STORE_FILE, DATASET_METADATA_FILE)
+    )
+
+    now = time.time()
+    write_json(staging / PROCESSED_CACHE_ENTRY_FILE, {
+        "key": key,
+        "source_job": job_dir.name,
+        "size_bytes": size,
+        "created": now,
+        "last_used": now,
+        "hits": 0
+    })
+
+    with cache_lock(cache_dir / ".lock"):
+        if (cache_dir / key).exists():
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        os.rename(staging, cache_dir / key)
+        evict_processed_cache(cache_dir, max_bytes, locked=True)
+
+
+def evict_processed_cache(
+    cache_dir: Path = PROCESSED_CACHE_DIR,
+    max_bytes: int = PROCESSED_CACHE_MAX_BYTES,
+    locked: bool = False
+):
+    if not locked:
+        with cache_lock(cache_dir / ".lock"):
+            return evict_processed_cache(cache_dir, max_bytes, locked=True)
+
+    evicted = evict_lru(cache_dir, PROCESSED_CACHE_ENTRY_FILE, max_bytes)
+    if evicted:
+        _bump(cache_dir, evictions=evicted)
+
+    return evicted
+
+
+def processed_cache_stats(cache_dir: Path = PROCESSED_CACHE_DIR) -> dict:
+    if not cache_dir.exists():
+        stats = dict(_EMPTY_STATS)
+        entries = []
+    else:
+        with cache_lock(cache_dir / ".lock"):
+            stats = read_json(cache_dir / PROCESSED_CACHE_STATS_FILE, dict(_EMPTY_STATS))
+            entries = list_entries(cache_dir, PROCESSED_CACHE_ENTRY_FILE)
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+        "entries": len(entries),
+        "size_bytes": sum(entry["size_bytes"] for _, entry in entries),
+        "max_bytes": PROCESSED_CACHE_MAX_BYTES
+    }
@@ -0,0 +1,125 @@
+import os
+import json
+import fcntl
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import yaml
+
+from src.constants import (
+    PROCESSED_DIR,
+    IMAGES_DIR,
+    LABELS_DIR,
+    IMAGE_EXTENSIONS,
+    RESIZED_DIR,
+    RESIZED_INDEX_FILE,
+    RESIZE_WORKERS,
+    RESIZE_JPEG_QUALITY
+)
+from src.utils.file_materializer import materialize
+from src.utils.image_header import read_image_header
+
+
+def _stamp(path: Path) -> list:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def resize_image(src: Path, dest: Path, imgsz: int) -> str:
+    """
+    Writes src scaled so its long side is imgsz, the size ultralytics
+    would resize it to on every load. Images that already fit are linked.
+
+    YOLO labels are normalised, so a uniform scale leaves them valid.
+    Returns "resized" or the materialize method used.
+    """
+    with open(src, "rb") as f:
+        header = read_image_header(f, src.stat().st_size)
+
+    if max(header["width"], header["height"]) <= imgsz:
+        return materialize(src, dest)
+
+    image = cv2.imread(str(src), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Could not decode {src}")
+
+    h, w = image.shape[:2]
+    scale = imgsz / max(h, w)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    # dest may be a link of the original from an earlier run
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.stem}.tmp{dest.suffix}")
+    params = [cv2.IMWRITE_JPEG_QUALITY, RESIZE_JPEG_QUALITY] if header["format"] == "jpeg" else []
+    if not cv2.imwrite(str(tmp), image, params):
+        tmp.unlink(missing_ok=True)
+        raise ValueError(f"Could not write {dest}")
+    os.replace(tmp, dest)
+
+    return "resized"
+
+
+def build_resized_dataset(job_dir: Path, imgsz: int, workers: int = RESIZE_WORKERS) -> Path:
+    """
+    Keeps resized/<imgsz>/ in sync with processed/: images downscaled to
+    imgsz, labels linked, and a data.yaml pointing at them.
+
+    Only images whose processed file changed since the last build are
+    redone, so later runs with the same imgsz reuse the existing copies.
+    Returns the path of the resized data.yaml.
+    """
+    processed_dir = job_dir / PROCESSED_DIR
+    resized_dir = job_dir / RESIZED_DIR / str(imgsz)
+    resized_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(resized_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        index_path = resized_dir / RESIZED_INDEX_FILE
+        index = {}
+        if index_path.exists():
+            with open(index_path) as f:
+                index = json.load(f)
+
+        # ultralytics' *.cache files hold absolute image paths, so they
+        # are left for it to regenerate
+        current = {}
+        for sub, suffixes in ((IMAGES_DIR, IMAGE_EXTENSIONS), (LABELS_DIR, [".txt"])):
+            for path in (processed_dir / sub).rglob("*"):
+                if path.is_file() and path.suffix.lower() in suffixes:
+                    current[path.relative_to(processed_dir).as_posix()] = _stamp(path)
+
+        for name in set(index) - set(current):
+            (resized_dir / name).unlink(missing_ok=True)
+
+        todo = [
+            name for name, stamp in current.items()
+            if index.get(name) != stamp or not (resized_dir / name).exists()
+        ]
+
+        def work(name):
+            src = processed_dir / name
+            dest = resized_dir / name
+            if name.startswith(f"{IMAGES_DIR}/"):
+                return resize_image(src, dest, imgsz)
+            return materialize(src, dest)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(work, todo))
+
+        tmp_path = index_path.with_name(f".{index_path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(current, f)
+        os.replace(tmp_path, index_path)
+
+        with open(processed_dir / "data.yaml") as f:
+            data = yaml.safe_load(f)
+        data["path"] = str(resized_dir)
+
+        yaml_path = resized_dir / "data.yaml"
+        with open(yaml_path, "w") as f:
+            yaml.safe_dump(data, f)
+
+    return yaml_path
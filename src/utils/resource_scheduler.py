@@ -0,0 +1,134 @@
+import os
+
+from src.constants import (
+    DEFAULT_BATCH,
+    DEFAULT_IMGSZ,
+    TRAIN_CPUS_PER_JOB,
+    TRAIN_PIN_CPUS,
+    TRAIN_MEM_BASE_BYTES,
+    TRAIN_MEM_PER_PIXEL_BYTES,
+    TRAIN_MEM_FRACTION
+)
+
+# Thread pools that otherwise size themselves to every core on the host
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS"
+)
+
+
+def read_meminfo() -> dict:
+    """
+    /proc/meminfo in bytes (Linux). Empty elsewhere.
+    """
+    info = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                info[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return info
+
+
+def available_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def estimate_job_memory(params: dict) -> int:
+    """
+    Rough peak RSS of a CPU training: model + framework baseline plus
+    activations and loader buffers, which grow with batch * imgsz^2.
+    """
+    batch = params.get("batch", DEFAULT_BATCH)
+    imgsz = params.get("imgsz", DEFAULT_IMGSZ)
+    return TRAIN_MEM_BASE_BYTES + batch * imgsz * imgsz * TRAIN_MEM_PER_PIXEL_BYTES
+
+
+class ResourceScheduler:
+    """
+    Splits the host into `slots` fixed CPU shares and a RAM budget.
+
+    Every training gets the same number of cores however many others are
+    running, so a batch/imgsz combination has a predictable epoch time.
+    A job is admitted only when a share is free and its memory estimate
+    fits both the budget and what the kernel reports as available.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        cpus: list = None,
+        cpus_per_job: int = TRAIN_CPUS_PER_JOB,
+        mem_fraction: float = TRAIN_MEM_FRACTION,
+        pin: bool = TRAIN_PIN_CPUS
+    ):
+        cpus = cpus or available_cpus()
+        slots = max(1, min(slots, len(cpus)))
+        per_job = cpus_per_job or len(cpus) // slots
+        per_job = max(1, min(per_job, len(cpus) // slots))
+
+        self.cpu_sets = [cpus[i * per_job:(i + 1) * per_job] for i in range(slots)]
+        self.pin = pin
+        self.mem_budget = int(read_meminfo().get("MemTotal", 0) * mem_fraction)
+        self.allocations = {}   # key -> allocation
+
+    def _free_slot(self):
+        used = {allocation["slot"] for allocation in self.allocations.values()}
+        for slot in range(len(self.cpu_sets)):
+            if slot not in used:
+                return slot
+        return None
+
+    def committed_memory(self) -> int:
+        return sum(allocation["memory_bytes"] for allocation in self.allocations.values())
+
+    def try_allocate(self, key, params: dict):
+        """
+        Reserves a CPU share and memory for a job, or returns None if it
+        does not fit right now.
+        """
+        slot = self._free_slot()
+        if slot is None:
+            return None
+
+        memory = estimate_job_memory(params)
+        if self.mem_budget:
+            available = read_meminfo().get("MemAvailable", self.mem_budget)
+            # An oversized job is still run alone rather than never
+            if self.allocations and (
+                self.committed_memory() + memory > self.mem_budget or memory > available
+            ):
+                return None
+
+        cpus = self.cpu_sets[slot]
+        allocation = {
+            "slot": slot,
+            "cpus": cpus if self.pin else None,
+            "threads": len(cpus),
+            "workers": max(1, len(cpus) // 2),
+            "memory_bytes": memory
+        }
+        self.allocations[key] = allocation
+        return allocation
+
+    def release(self, key):
+        self.allocations.pop(key, None)
+
+
+def apply_allocation(allocation: dict):
+    """
+    Applies an allocation inside the training process, before torch and
+    OpenCV are imported so their thread pools are sized from it.
+    """
+    threads = str(allocation["threads"])
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = threads
+
+    if allocation.get("cpus") and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, allocation["cpus"])
@@ -0,0 +1,207 @@
+import re
+from pathlib import Path
+from datetime import timezone
+from email.utils import format_datetime
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.constants import S3_STREAM_CHUNK_SIZE, ARTIFACT_CACHE_ENABLED
+from src.utils.s3_utils import get_s3_object, head_s3_object
+from src.utils.artifact_cache import open_cached_artifact, fill_artifact_cache
+
+# Single ranges only ("bytes=0-99", "bytes=100-", "bytes=-100"); anything
+# else is ignored and the whole object is sent, as RFC 9110 allows
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _byte_range(header: str):
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start, end = match.groups()
+    if start and end and int(end) < int(start):
+        return None
+    return header.strip()
+
+
+def _status(error: ClientError) -> int:
+    return error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _last_modified(obj: dict) -> str:
+    return format_datetime(obj["LastModified"].astimezone(timezone.utc), usegmt=True)
+
+
+def _iter_body(body, chunk_size: int):
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def _iter_file(f, start: int, length: int, chunk_size: int):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _file_response(
+    request: Request,
+    f,
+    head: dict,
+    filename: str,
+    media_type: str,
+    chunk_size: int
+) -> Response:
+    """
+    Serves an already open cached copy, with the same Range/If-Range rules
+    as the S3 path. Reading from the open file keeps working if the cache
+    entry is evicted meanwhile.
+    """
+    size = head["ContentLength"]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": head["ETag"],
+        "Last-Modified": _last_modified(head)
+    }
+
+    start, end, status = 0, size - 1, 200
+    byte_range = _byte_range(request.headers.get("range"))
+    if_range = request.headers.get("if-range")
+    if byte_range and (not if_range or if_range == head["ETag"]):
+        first, last = _RANGE.match(byte_range).groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            # Last N bytes; "bytes=-0" selects nothing
+            start = max(0, size - int(last)) if int(last) else size
+        if start >= size:
+            f.close()
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file(f, start, end - start + 1, chunk_size),
+        status_code=status,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def _not_found(e: ClientError, filename: str):
+    if _status(e) == 404:
+        raise HTTPException(status_code=404, detail=f"{filename} not found")
+    raise e
+
+
+def _missing(e: ClientError, filename: str, local_copy: Path, media_type: str) -> Response:
+    """
+    Not in S3 (yet): artifacts whose upload is pending or being retried are
+    served from the local copy when this host has it.
+    """
+    if _status(e) == 404 and local_copy is not None and Path(local_copy).exists():
+        return FileResponse(local_copy, filename=filename, media_type=media_type)
+    _not_found(e, filename)
+
+
+def stream_s3_object(
+    request: Request,
+    s3_key: str,
+    filename: str,
+    media_type: str = "application/octet-stream",
+    local_copy: Path = None,
+    chunk_size: int = S3_STREAM_CHUNK_SIZE
+) -> Response:
+    """
+    Serves an S3 object, honouring Range (206/416), If-Range and
+    If-None-Match (304) and passing through Content-Length, ETag and
+    Last-Modified.
+
+    With the artifact cache enabled a cached copy is served from local
+    disk. Otherwise the S3 body is relayed chunk by chunk, and on a cache
+    miss the cache is filled in the background (local_copy may seed it).
+    If the object is not in S3, local_copy is served when it exists.
+    """
+    if ARTIFACT_CACHE_ENABLED:
+        try:
+            head = head_s3_object(s3_key)
+        except ClientError as e:
+            return _missing(e, filename, local_copy, media_type)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, head["ETag"]):
+            return Response(status_code=304, headers={"ETag": head["ETag"]})
+
+        f = open_cached_artifact(s3_key, head["ETag"])
+        if f is not None:
+            return _file_response(request, f, head, filename, media_type, chunk_size)
+
+        # Miss: relayed from S3 below so the first byte goes out right away;
+        # the cache is filled alongside for the next download
+        fill_artifact_cache(s3_key, head["ETag"], head["ContentLength"], local_copy)
+
+    byte_range = _byte_range(request.headers.get("range"))
+    if_range = request.headers.get("if-range")
+    if_none_match = request.headers.get("if-none-match")
+    if byte_range and if_range and not if_range.startswith(('"', "W/")):
+        # Date validators are not compared; a full response is always safe
+        byte_range = None
+
+    try:
+        try:
+            obj = get_s3_object(
+                s3_key, byte_range, if_none_match, if_match=if_range if byte_range else None
+            )
+        except ClientError as e:
+            if _status(e) != 412:
+                raise
+            # If-Range no longer matches: the client's partial copy is stale
+            byte_range = None
+            obj = get_s3_object(s3_key, if_none_match=if_none_match)
+    except ClientError as e:
+        status = _status(e)
+        if status == 304:
+            etag = e.response.get("Error", {}).get("ETag") or if_none_match
+            return Response(status_code=304, headers={"ETag": etag})
+        if status == 416:
+            size = head_s3_object(s3_key)["ContentLength"]
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return _missing(e, filename, local_copy, media_type)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(obj["ContentLength"]),
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
+    if obj.get("ETag"):
+        headers["ETag"] = obj["ETag"]
+    if obj.get("LastModified"):
+        headers["Last-Modified"] = _last_modified(obj)
+    if obj.get("ContentRange"):
+        headers["Content-Range"] = obj["ContentRange"]
+
+    return StreamingResponse(
+        _iter_body(obj["Body"], chunk_size),
+        status_code=206 if obj.get("ContentRange") else 200,
+        media_type=media_type,
+        headers=headers
+    )
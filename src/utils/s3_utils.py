@@ -1,22 +1,179 @@
-import boto3
+import time
+import hashlib
+import threading
 from pathlib import Path
-from src.constants import S3_BUCKET_NAME
+from concurrent.futures import ThreadPoolExecutor
+from src.constants import (
+    S3_BUCKET_NAME,
+    S3_ENDPOINT_URL,
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_MAX_CONCURRENCY,
+    S3_UPLOAD_WORKERS,
+    S3_UPLOAD_ATTEMPTS,
+    S3_RETRY_BACKOFF_SECONDS
+)
 
-s3 = boto3.client("s3")
+# boto3 is imported and the client built on first use, not at import time;
+# both are shared by every thread afterwards (boto3 clients are thread-safe)
+_client = None
+_transfer_config = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    global _client, _transfer_config
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+                from botocore.config import Config
+
+                _transfer_config = TransferConfig(
+                    multipart_threshold=S3_MULTIPART_THRESHOLD,
+                    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+                    max_concurrency=S3_MAX_CONCURRENCY,
+                    use_threads=True
+                )
+                # S3_ENDPOINT_URL points the client at MinIO / moto instead of AWS
+                _client = boto3.client(
+                    "s3",
+                    endpoint_url=S3_ENDPOINT_URL,
+                    config=Config(
+                        retries={"max_attempts": S3_UPLOAD_ATTEMPTS, "mode": "adaptive"},
+                        # every part of every file in a batch can be in flight at once
+                        max_pool_connections=S3_MAX_CONCURRENCY * S3_UPLOAD_WORKERS
+                    )
+                )
+    return _client
+
+
+def get_transfer_config():
+    get_s3_client()
+    return _transfer_config
+
+
+class S3UploadError(RuntimeError):
+    def __init__(self, failed: list):
+        self.failed = failed
+        keys = ", ".join(item["key"] for item in failed)
+        super().__init__(f"S3 upload failed for: {keys}")
 
 
 def upload_file_to_s3(local_path: Path, s3_key: str):
-    s3.upload_file(
+    get_s3_client().upload_file(
         Filename=str(local_path),
         Bucket=S3_BUCKET_NAME,
-        Key=s3_key
+        Key=s3_key,
+        Config=get_transfer_config()
     )
 
 
+def _upload_with_retries(local_path: Path, s3_key: str, attempts: int) -> dict:
+    start = time.time()
+    for attempt in range(1, attempts + 1):
+        try:
+            upload_file_to_s3(local_path, s3_key)
+            return {
+                "key": s3_key,
+                "bytes": Path(local_path).stat().st_size,
+                "attempts": attempt,
+                "seconds": round(time.time() - start, 3)
+            }
+        except Exception as e:
+            error = str(e)
+            if attempt < attempts:
+                time.sleep(S3_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    return {"key": s3_key, "attempts": attempts, "error": error}
+
+
+def upload_files_to_s3(
+    files: list,
+    workers: int = S3_UPLOAD_WORKERS,
+    attempts: int = S3_UPLOAD_ATTEMPTS
+) -> list:
+    """
+    Uploads (local_path, s3_key) pairs in parallel; each file is itself a
+    concurrent multipart upload above S3_MULTIPART_THRESHOLD. Failed files
+    are retried with exponential backoff.
+
+    Returns per-file results; raises S3UploadError if any file still fails.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files) or 1))) as pool:
+        results = list(pool.map(
+            lambda item: _upload_with_retries(item[0], item[1], attempts),
+            files
+        ))
+
+    failed = [result for result in results if "error" in result]
+    if failed:
+        raise S3UploadError(failed)
+    return results
+
+
 def download_file_from_s3(local_path: Path, s3_key: str):
     local_path.parent.mkdir(parents=True, exist_ok=True)
-    s3.download_file(
+    get_s3_client().download_file(
         Bucket=S3_BUCKET_NAME,
         Key=s3_key,
-        Filename=str(local_path)
+        Filename=str(local_path),
+        Config=get_transfer_config()
     )
+
+
+def get_s3_object(
+    s3_key: str,
+    byte_range: str = None,
+    if_none_match: str = None,
+    if_match: str = None
+) -> dict:
+    """
+    GET of an object whose Body is read lazily. byte_range is an HTTP
+    "bytes=..." spec; S3 answers 304 when if_none_match matches the ETag
+    and 412 when if_match does not.
+    """
+    kwargs = {"Bucket": S3_BUCKET_NAME, "Key": s3_key}
+    if byte_range:
+        kwargs["Range"] = byte_range
+    if if_none_match:
+        kwargs["IfNoneMatch"] = if_none_match
+    if if_match:
+        kwargs["IfMatch"] = if_match
+    return get_s3_client().get_object(**kwargs)
+
+
+def head_s3_object(s3_key: str) -> dict:
+    return get_s3_client().head_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+
+
+def s3_etag(local_path: Path, read_size: int = 1024 * 1024) -> str:
+    """
+    The ETag S3 assigns to local_path when it is uploaded with the transfer
+    config: the MD5 of the file, or above the multipart threshold the MD5 of
+    the part MD5s suffixed with the part count.
+    """
+    size = Path(local_path).stat().st_size
+    part_size = S3_MULTIPART_CHUNKSIZE if size >= S3_MULTIPART_THRESHOLD else max(size, 1)
+
+    parts = []
+    with open(local_path, "rb") as f:
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                chunk = f.read(min(read_size, remaining))
+                if not chunk:
+                    break
+                part.update(chunk)
+                remaining -= len(chunk)
+            if remaining == part_size and parts:
+                break
+            parts.append(part.digest())
+            if remaining:
+                break
+
+    if size < S3_MULTIPART_THRESHOLD:
+        return f'"{parts[0].hex()}"'
+    return f'"{hashlib.md5(b"".join(parts)).hexdigest()}-{len(parts)}"'
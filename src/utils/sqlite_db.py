@@ -0,0 +1,39 @@
+import sqlite3
+from pathlib import Path
+from contextlib import contextmanager
+
+# (db path, schema) pairs already created by this process
+_initialized = set()
+
+
+@contextmanager
+def connect(db_path: Path, schema: str, migrations: tuple = ()):
+    """
+    Autocommit connection to a local SQLite store shared by the API and
+    worker processes. WAL lets readers run alongside a writer; multi-
+    statement updates open their own BEGIN IMMEDIATE transaction.
+
+    migrations are ALTER TABLE ... ADD COLUMN statements for stores created
+    by older code; ones that already applied are skipped.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        # WAL + NORMAL: commits survive a process crash, fsync at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        key = (str(db_path.resolve()), schema)
+        if key not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(schema)
+            for statement in migrations:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    if "duplicate column" not in str(e):
+                        raise
+            _initialized.add(key)
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,97 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+# Must never be loaded by the API process; the training worker imports
+# them in its training processes only
+HEAVY_MODULES = ("torch", "ultralytics", "mlflow", "cv2", "boto3")
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+rss = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) * 1024
+print(json.dumps({{
+    "import_seconds": seconds,
+    "rss_bytes": rss,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def _probe(module: str) -> dict:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["process_seconds"] = time.perf_counter() - start
+    return sample
+
+
+def measure_startup(module: str = "app.main", runs: int = 5) -> dict:
+    """
+    Imports module in `runs` fresh interpreters and reports the import
+    time, whole-process start time and resident memory after import.
+    """
+    samples = [_probe(module) for _ in range(runs)]
+
+    def summary(field):
+        values = [sample[field] for sample in samples]
+        return {
+            "median": round(statistics.median(values), 4),
+            "min": round(min(values), 4),
+            "max": round(max(values), 4)
+        }
+
+    return {
+        "module": module,
+        "runs": runs,
+        "import_seconds": summary("import_seconds"),
+        "process_seconds": summary("process_seconds"),
+        "rss_mb": {
+            key: round(value / 1024 ** 2, 1)
+            for key, value in summary("rss_bytes").items()
+        },
+        "heavy_modules": sorted({m for sample in samples for m in sample["heavy_modules"]})
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API cold start benchmark")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="fail if the median import time is above this")
+    parser.add_argument("--max-rss-mb", type=float, default=None,
+                        help="fail if the median resident memory is above this")
+    args = parser.parse_args()
+
+    report = measure_startup(args.module, args.runs)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["heavy_modules"]:
+        failures.append(f"heavy modules loaded at import: {report['heavy_modules']}")
+    if args.max_seconds is not None and report["import_seconds"]["median"] > args.max_seconds:
+        failures.append(f"import took {report['import_seconds']['median']}s")
+    if args.max_rss_mb is not None and report["rss_mb"]["median"] > args.max_rss_mb:
+        failures.append(f"resident memory {report['rss_mb']['median']} MB")
+
+    if failures:
+        sys.exit("; ".join(failures))
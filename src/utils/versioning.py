@@ -1,30 +1,278 @@
+import os
 import json
+import time
+import fcntl
 from pathlib import Path
-from src.constants import RUNS_DIR, VERSION_PREFIX, LATEST_FILE
+from contextlib import contextmanager
+from src.constants import (
+    RUNS_DIR,
+    VERSION_PREFIX,
+    LATEST_FILE,
+    BASE_UPLOAD_DIR,
+    ARTIFACTS_DIR,
+    JOB_REGISTRY_DB,
+    STATUS_RUNNING,
+    STATUS_COMPLETED,
+    STATUS_FAILED
+)
+from src.utils.sqlite_db import connect
 
+# One row per model version. A version is reserved (running) before any
+# file is written and becomes visible to latest/best once completed.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS model_versions (
+    job_id TEXT NOT NULL,
+    version_num INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    state TEXT NOT NULL,
+    fingerprint TEXT,
+    map50 REAL,
+    map50_95 REAL,
+    metrics TEXT,
+    params TEXT,
+    s3_key TEXT,
+    model_path TEXT,
+    owner_pid INTEGER,
+    created_at REAL NOT NULL,
+    completed_at REAL,
+    PRIMARY KEY (job_id, version_num)
+);
+CREATE INDEX IF NOT EXISTS model_versions_latest
+    ON model_versions (job_id, state, version_num DESC);
+CREATE INDEX IF NOT EXISTS model_versions_job_best
+    ON model_versions (job_id, state, map50_95 DESC);
+CREATE INDEX IF NOT EXISTS model_versions_fingerprint_best
+    ON model_versions (fingerprint, state, map50_95 DESC);
+"""
 
-def get_next_version(artifacts_dir: Path) -> str:
-    runs_dir = artifacts_dir / RUNS_DIR
-    runs_dir.mkdir(exist_ok=True)
+_MIGRATIONS = (
+    "ALTER TABLE model_versions ADD COLUMN owner_pid INTEGER",
+)
 
-    versions = [
-        int(p.name.replace(VERSION_PREFIX, ""))
+# ultralytics' names, with and without the characters MLflow strips
+_MAP50_KEYS = ("metrics/mAP50(B)", "metrics/mAP50B")
+_MAP50_95_KEYS = ("metrics/mAP50-95(B)", "metrics/mAP50-95B")
+
+
+def _connect(db_path: Path = JOB_REGISTRY_DB):
+    return connect(db_path, _SCHEMA, _MIGRATIONS)
+
+
+def _first(metrics: dict, keys):
+    for key in keys:
+        if metrics.get(key) is not None:
+            return float(metrics[key])
+    return None
+
+
+def _version(row) -> dict:
+    if row is None:
+        return None
+    version = dict(row)
+    version["metrics"] = json.loads(version["metrics"]) if version["metrics"] else None
+    version["params"] = json.loads(version["params"]) if version["params"] else None
+    return version
+
+
+def _scan_versions(job_id: str) -> int:
+    """
+    Highest vN under runs/ for jobs trained before the registry existed.
+    """
+    runs_dir = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR / RUNS_DIR
+    if not runs_dir.exists():
+        return 0
+    return max((
+        int(p.name[len(VERSION_PREFIX):])
         for p in runs_dir.iterdir()
         if p.is_dir() and p.name.startswith(VERSION_PREFIX)
-    ]
+        and p.name[len(VERSION_PREFIX):].isdigit()
+    ), default=0)
+
+
+def allocate_version(
+    job_id: str,
+    fingerprint: str = None,
+    params: dict = None,
+    db_path: Path = JOB_REGISTRY_DB
+) -> str:
+    """
+    Reserves the next version of a job in one transaction, so concurrent
+    trainings of the same job always get distinct versions. The calling
+    process owns it until it is finished (see fail_abandoned_versions).
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute(
+                "SELECT MAX(version_num) FROM model_versions WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            if current is None:
+                current = _scan_versions(job_id)
+
+            version_num = current + 1
+            version = f"{VERSION_PREFIX}{version_num}"
+            conn.execute(
+                "INSERT INTO model_versions (job_id, version_num, version, state, "
+                "fingerprint, params, owner_pid, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, version_num, version, STATUS_RUNNING, fingerprint,
+                 json.dumps(params) if params is not None else None, os.getpid(), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return version
+
+
+def finish_version(
+    job_id: str,
+    version: str,
+    state: str = STATUS_COMPLETED,
+    metrics: dict = None,
+    s3_key: str = None,
+    model_path: Path = None,
+    db_path: Path = JOB_REGISTRY_DB
+):
+    metrics = metrics or {}
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE model_versions SET state = ?, map50 = ?, map50_95 = ?, metrics = ?, "
+            "s3_key = ?, model_path = ?, completed_at = ? WHERE job_id = ? AND version = ?",
+            (state, _first(metrics, _MAP50_KEYS), _first(metrics, _MAP50_95_KEYS),
+             json.dumps(metrics), s3_key, str(model_path) if model_path else None,
+             time.time(), job_id, version)
+        )
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
 
-    next_version = max(versions) + 1 if versions else 1
-    return f"{VERSION_PREFIX}{next_version}"
+
+def fail_abandoned_versions(
+    owner_pid: int = None,
+    state: str = STATUS_FAILED,
+    db_path: Path = JOB_REGISTRY_DB
+) -> int:
+    """
+    Finishes versions left running by trainings that died without doing
+    it themselves (cancelled, killed, crashed): those of owner_pid, which
+    must have exited, or else every one whose owner is no longer alive.
+    Returns the number of versions finished.
+    """
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT job_id, version, owner_pid FROM model_versions WHERE state = ?",
+                (STATUS_RUNNING,)
+            ).fetchall()
+            abandoned = [
+                row for row in rows
+                if (row["owner_pid"] == owner_pid if owner_pid is not None
+                    else row["owner_pid"] is None or not _pid_alive(row["owner_pid"]))
+            ]
+            for row in abandoned:
+                conn.execute(
+                    "UPDATE model_versions SET state = ?, completed_at = ? "
+                    "WHERE job_id = ? AND version = ?",
+                    (state, time.time(), row["job_id"], row["version"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return len(abandoned)
+
+
+@contextmanager
+def promotion_lock(job_id: str):
+    """
+    Held while a training completes its version and, if it is the latest,
+    promotes it to artifacts/model/best.pt and latest.json, so concurrent
+    trainings of a job promote in version order.
+    """
+    artifacts_dir = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR
+    artifacts_dir.mkdir(parents=True, exist_ok=True)
+    with open(artifacts_dir / ".promote.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def get_model_version(job_id: str, version: str, db_path: Path = JOB_REGISTRY_DB):
+    with _connect(db_path) as conn:
+        return _version(conn.execute(
+            "SELECT * FROM model_versions WHERE job_id = ? AND version = ?",
+            (job_id, version)
+        ).fetchone())
+
+
+def latest_model_version(job_id: str, db_path: Path = JOB_REGISTRY_DB):
+    with _connect(db_path) as conn:
+        return _version(conn.execute(
+            "SELECT * FROM model_versions WHERE job_id = ? AND state = ? "
+            "ORDER BY version_num DESC LIMIT 1",
+            (job_id, STATUS_COMPLETED)
+        ).fetchone())
+
+
+def best_model_version(
+    fingerprint: str = None,
+    job_id: str = None,
+    db_path: Path = JOB_REGISTRY_DB
+):
+    """
+    Completed version with the highest mAP50-95, for a dataset fingerprint
+    (across every job trained on it) or for one job.
+    """
+    if (fingerprint is None) == (job_id is None):
+        raise ValueError("Pass exactly one of fingerprint or job_id")
+    column, value = ("fingerprint", fingerprint) if fingerprint else ("job_id", job_id)
+
+    with _connect(db_path) as conn:
+        return _version(conn.execute(
+            f"SELECT * FROM model_versions WHERE {column} = ? AND state = ? "
+            "AND map50_95 IS NOT NULL ORDER BY map50_95 DESC LIMIT 1",
+            (value, STATUS_COMPLETED)
+        ).fetchone())
+
+
+def list_model_versions(job_id: str, db_path: Path = JOB_REGISTRY_DB) -> list:
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM model_versions WHERE job_id = ? ORDER BY version_num DESC",
+            (job_id,)
+        ).fetchall()
+    return [_version(row) for row in rows]
 
 
 def update_latest_version(artifacts_dir: Path, version: str):
+    """
+    Mirrors the latest version to runs/latest.json for file-based readers.
+    Written atomically.
+    """
     latest_path = artifacts_dir / RUNS_DIR / LATEST_FILE
-    with open(latest_path, "w") as f:
+    tmp = latest_path.with_name(f".{latest_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
         json.dump({"latest_version": version}, f, indent=2)
+    os.replace(tmp, latest_path)
 
 
-def get_latest_version(artifacts_dir: Path) -> str:
-    latest_path = artifacts_dir / RUNS_DIR / LATEST_FILE
+def get_latest_version(job_id: str) -> str:
+    """
+    Latest completed version from the registry, falling back to
+    runs/latest.json for jobs trained before it existed.
+    """
+    latest = latest_model_version(job_id)
+    if latest is not None:
+        return latest["version"]
+
+    latest_path = BASE_UPLOAD_DIR / job_id / ARTIFACTS_DIR / RUNS_DIR / LATEST_FILE
     if not latest_path.exists():
         raise FileNotFoundError("No latest version found")
     with open(latest_path) as f:
@@ -6,6 +6,8 @@ def parse_voc_xml(xml_path: Path):
     """
     Parses a Pascal VOC XML file.
 
+    Accepts a path or a binary file object (e.g. a ZIP member).
+
     Returns:
         image_width (int)
         image_height (int)
@@ -16,7 +18,8 @@ def parse_voc_xml(xml_path: Path):
 
     size = root.find("size")
     if size is None:
-        raise ValueError(f"Missing <size> tag in {xml_path.name}")
+        name = Path(getattr(xml_path, "name", str(xml_path))).name
+        raise ValueError(f"Missing <size> tag in {name}")
 
     img_w = int(size.find("width").text)
     img_h = int(size.find("height").text)
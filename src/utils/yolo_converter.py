@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def voc_to_yolo(bbox, img_w, img_h):
     xmin, ymin, xmax, ymax = bbox
 
@@ -7,3 +10,37 @@ def voc_to_yolo(bbox, img_w, img_h):
     height = (ymax - ymin) / img_h
 
     return x_center, y_center, width, height
+
+
+def voc_to_yolo_batch(boxes, img_w, img_h):
+    """
+    Vectorized voc_to_yolo.
+
+    boxes: (N, 4) integer array of xmin, ymin, xmax, ymax
+    img_w, img_h: (N,) arrays with each box's image size
+
+    Boxes are clipped to the image first; the arithmetic is the same as
+    voc_to_yolo, in float64, so in-bounds boxes give identical values.
+
+    Returns:
+        yolo (N, 4) float64 array of x_center, y_center, width, height
+        valid (N,) bool mask, False for boxes that are empty after clipping
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    img_w = np.asarray(img_w, dtype=np.int64)
+    img_h = np.asarray(img_h, dtype=np.int64)
+
+    xmin = np.clip(boxes[:, 0], 0, img_w)
+    ymin = np.clip(boxes[:, 1], 0, img_h)
+    xmax = np.clip(boxes[:, 2], 0, img_w)
+    ymax = np.clip(boxes[:, 3], 0, img_h)
+
+    valid = (xmax > xmin) & (ymax > ymin)
+
+    yolo = np.empty((len(boxes), 4), dtype=np.float64)
+    yolo[:, 0] = ((xmin + xmax) / 2) / img_w
+    yolo[:, 1] = ((ymin + ymax) / 2) / img_h
+    yolo[:, 2] = (xmax - xmin) / img_w
+    yolo[:, 3] = (ymax - ymin) / img_h
+
+    return yolo, valid
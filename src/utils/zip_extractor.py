@@ -0,0 +1,195 @@
+import time
+import stat
+import zipfile
+from pathlib import Path, PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+
+from src.constants import (
+    EXTRACT_WORKERS,
+    EXTRACT_CHUNK_SIZE,
+    MAX_ARCHIVE_MEMBERS,
+    MAX_UNCOMPRESSED_BYTES,
+    MAX_COMPRESSION_RATIO
+)
+
+
+class UnsafeArchiveError(ValueError):
+    pass
+
+
+def _member_parts(name: str):
+    """
+    Normalises a member name and rejects anything that could escape the
+    extraction directory.
+    """
+    normalized = name.replace("\\", "/")
+    path = PurePosixPath(normalized)
+
+    if path.is_absolute() or (path.parts and ":" in path.parts[0]):
+        raise UnsafeArchiveError(f"Absolute path in archive: {name}")
+
+    if any(part == ".." for part in path.parts):
+        raise UnsafeArchiveError(f"Path traversal in archive: {name}")
+
+    return [part for part in path.parts if part not in ("", ".")]
+
+
+def check_archive(
+    zf: zipfile.ZipFile,
+    max_members: int = MAX_ARCHIVE_MEMBERS,
+    max_total_bytes: int = MAX_UNCOMPRESSED_BYTES,
+    max_ratio: int = MAX_COMPRESSION_RATIO
+):
+    """
+    Checks the central directory before anything is decompressed.
+
+    Rejects zip bombs (member count, total declared size, per-member
+    compression ratio), path traversal, symlinks and encrypted members.
+
+    Returns:
+        members (list of (ZipInfo, relative parts))
+    """
+    infos = zf.infolist()
+
+    if len(infos) > max_members:
+        raise UnsafeArchiveError(
+            f"Archive has {len(infos)} members, limit is {max_members}"
+        )
+
+    total = sum(info.file_size for info in infos)
+    if total > max_total_bytes:
+        raise UnsafeArchiveError(
+            f"Archive expands to {total} bytes, limit is {max_total_bytes}"
+        )
+
+    members = []
+    for info in infos:
+        parts = _member_parts(info.filename)
+        if not parts:
+            continue
+
+        mode = info.external_attr >> 16
+        if stat.S_ISLNK(mode):
+            raise UnsafeArchiveError(f"Symlink in archive: {info.filename}")
+
+        if info.flag_bits & 0x1:
+            raise UnsafeArchiveError(f"Encrypted member in archive: {info.filename}")
+
+        if info.compress_size and info.file_size / info.compress_size > max_ratio:
+            raise UnsafeArchiveError(
+                f"Suspicious compression ratio for {info.filename}"
+            )
+
+        members.append((info, parts))
+
+    return members
+
+
+def _balance(members, n_buckets: int):
+    """
+    Greedy size-balanced partition so each worker gets a similar byte load.
+    """
+    buckets = [[] for _ in range(n_buckets)]
+    loads = [0] * n_buckets
+
+    for member in sorted(members, key=lambda m: m[0].file_size, reverse=True):
+        idx = loads.index(min(loads))
+        buckets[idx].append(member)
+        loads[idx] += member[0].file_size
+
+    return [b for b in buckets if b]
+
+
+def _drain(src, dst, info: zipfile.ZipInfo):
+    written = 0
+    while True:
+        chunk = src.read(EXTRACT_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        written += len(chunk)
+        if written > info.file_size:
+            raise UnsafeArchiveError(
+                f"{info.filename} expands beyond its declared size"
+            )
+        if dst is not None:
+            dst.write(chunk)
+
+    return written
+
+
+def _extract_bucket(zip_path: Path, bucket, dest_dir: Path | None):
+    written_total = 0
+
+    # One handle per worker: ZipFile seeks are not shared between threads
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info, parts in bucket:
+            if info.is_dir():
+                if dest_dir is not None:
+                    dest_dir.joinpath(*parts).mkdir(parents=True, exist_ok=True)
+                continue
+
+            # ZipExtFile verifies the CRC when the member is fully read
+            with zf.open(info) as src:
+                if dest_dir is None:
+                    written_total += _drain(src, None, info)
+                    continue
+
+                target = dest_dir.joinpath(*parts)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Never write through an existing file: it may be hardlinked
+                # into processed/ or a cache
+                target.unlink(missing_ok=True)
+                with open(target, "wb") as dst:
+                    written_total += _drain(src, dst, info)
+
+    return written_total
+
+
+def extract_zip_parallel(
+    zip_path: Path,
+    dest_dir: Path | None,
+    workers: int = EXTRACT_WORKERS,
+    max_members: int = MAX_ARCHIVE_MEMBERS,
+    max_total_bytes: int = MAX_UNCOMPRESSED_BYTES
+):
+    """
+    Extracts a ZIP archive with member decompression and CRC checks spread
+    across a thread pool (zlib releases the GIL while inflating).
+
+    The archive is checked for bombs and unsafe paths before any byte is
+    written. With dest_dir=None members are only decompressed and
+    CRC-checked, nothing is written. Raises UnsafeArchiveError or
+    zipfile.BadZipFile on failure.
+    """
+    start = time.time()
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        members = check_archive(zf, max_members, max_total_bytes)
+
+    if dest_dir is not None:
+        dest_root = dest_dir.resolve()
+        for _, parts in members:
+            if not dest_root.joinpath(*parts).resolve().is_relative_to(dest_root):
+                raise UnsafeArchiveError(f"Path escapes extraction dir: {'/'.join(parts)}")
+
+    buckets = _balance(members, max(1, workers))
+
+    with ThreadPoolExecutor(max_workers=len(buckets) or 1) as pool:
+        written = sum(
+            pool.map(lambda b: _extract_bucket(zip_path, b, dest_dir), buckets)
+        )
+
+    return {
+        "members": len(members),
+        "bytes": written,
+        "workers": len(buckets),
+        "seconds": round(time.time() - start, 3)
+    }
+
+
+def verify_zip_parallel(zip_path: Path, workers: int = EXTRACT_WORKERS):
+    """
+    Same checks as extract_zip_parallel without writing anything to disk.
+    """
+    return extract_zip_parallel(zip_path, None, workers)